@@ -0,0 +1,128 @@
+"""Headless benchmarks for statement ingestion, categorisation and the tab aggregations.
+
+Runs the financeapp library (the processing core behind main.py) without a
+browser or Streamlit, against synthetic statements from benchmarks/synthetic.py.
+
+    python benchmarks/run_benchmarks.py --rows 1000 100000 1000000 --keywords 10 1000 10000
+    python benchmarks/run_benchmarks.py --output results.json
+"""
+import argparse
+import io
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+REPO_DIR = os.path.dirname(BENCH_DIR)
+
+
+class UploadedFile(io.BytesIO):
+    """Minimal stand-in for Streamlit's UploadedFile."""
+
+    def __init__(self, data, name):
+        super().__init__(data)
+        self.name = name
+        self.size = len(data)
+
+
+def measure(stages, name, func, *args, **kwargs):
+    tracemalloc.start()
+    start = time.perf_counter()
+    result = func(*args, **kwargs)
+    elapsed = time.perf_counter() - start
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    stages[name] = {"seconds": round(elapsed, 4), "peak_mb": round(peak / 2**20, 2)}
+    return result
+
+
+def run_case(financeapp, synthetic, rows, keywords, seed=0):
+    statement = synthetic.generate_statement(rows, seed=seed)
+    data = statement.to_csv(index=False).encode()
+    categories = synthetic.generate_categories(statement, keywords, seed=seed)
+    del statement
+
+    stages = {}
+    raw = measure(stages, "load_statement", financeapp.load_statement, UploadedFile(data, "statement.csv"))
+    df = measure(stages, "categorise_transaction", financeapp.categorise_transaction, raw.copy(), categories)
+    aggregates = measure(stages, "aggregates", financeapp.TransactionAggregates, df)
+    moved = df["CATEGORY"].iloc[: max(1, rows // 100)].astype(object)
+    moved[:] = "Shopping"
+    changed = financeapp.categorise.assign_categories(df["CATEGORY"], moved)
+    measure(stages, "aggregates_update_1pct", aggregates.update_categories, changed)
+    months = df["DATE"].dt.to_period("M")
+    latest = months == months.max()
+    analytics = measure(stages, "analytics", financeapp.SpendingAnalytics, df[~latest])
+    measure(stages, "analytics_add_month", analytics.update, df[latest])
+    measure(stages, "analytics_outliers", analytics.outliers, df)
+    measure(stages, "window_sorted_page", lambda: financeapp.window_transactions(
+        df, financeapp.filter_transactions(df, "WITHDRAWALS"), ["DATE", "PARTICULARS", "WITHDRAWALS", "CATEGORY"],
+        sort_by="WITHDRAWALS", ascending=False))
+    store = financeapp.transaction_store
+    measure(stages, "store_append", store.append_transactions, raw)
+    measure(stages, "store_query", store.query_transactions)
+    measure(stages, "ingest_csv_in_chunks", financeapp.ingest_csv_in_chunks,
+            UploadedFile(data, "statement.csv"), categories)
+
+    ingest_seconds = stages["load_statement"]["seconds"] + stages["categorise_transaction"]["seconds"]
+    return {
+        "rows": rows,
+        "keywords": keywords,
+        "csv_mb": round(len(data) / 2**20, 2),
+        "rows_per_second": round(rows / ingest_seconds) if ingest_seconds else None,
+        "stages": stages,
+    }
+
+
+def git_revision():
+    try:
+        return subprocess.check_output(["git", "rev-parse", "--short", "HEAD"], cwd=REPO_DIR,
+                                       text=True, stderr=subprocess.DEVNULL).strip()
+    except (subprocess.CalledProcessError, FileNotFoundError):
+        return None
+
+
+def print_report(results):
+    for case in results["cases"]:
+        print(f"\n{case['rows']:,} rows, {case['keywords']:,} keywords "
+              f"({case['csv_mb']} MB CSV, {case['rows_per_second']:,} rows/s ingest+categorise)")
+        for name, stage in case["stages"].items():
+            print(f"  {name:<26}{stage['seconds']:>10.4f} s{stage['peak_mb']:>12.2f} MB peak")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the Finance App processing paths.")
+    parser.add_argument("--rows", type=int, nargs="+", default=[1_000, 100_000, 1_000_000])
+    parser.add_argument("--keywords", type=int, nargs="+", default=[10, 1_000, 10_000])
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", help="write the results as JSON to this path")
+    args = parser.parse_args()
+    output = os.path.abspath(args.output) if args.output else None
+
+    sys.path.insert(0, BENCH_DIR)
+    sys.path.insert(0, REPO_DIR)
+    import synthetic
+    import financeapp
+    from financeapp import transaction_store
+
+    with tempfile.TemporaryDirectory() as workdir:
+        cases = []
+        for rows in args.rows:
+            for keywords in args.keywords:
+                # Each case starts from an empty store so append/query timings are comparable.
+                transaction_store.STORE_DIR = os.path.join(workdir, f"store-{rows}-{keywords}")
+                cases.append(run_case(financeapp, synthetic, rows, keywords, seed=args.seed))
+
+    results = {"revision": git_revision(), "python": sys.version.split()[0], "cases": cases}
+    print_report(results)
+    if output:
+        with open(output, "w") as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
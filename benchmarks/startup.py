@@ -0,0 +1,66 @@
+"""Cold-start benchmark for the Streamlit app.
+
+Each run starts a fresh interpreter in an empty working directory (no stored
+history, default categories) and times one headless script run of main.py with
+Streamlit's AppTest, i.e. the work done before the first paint.
+
+    python benchmarks/startup.py --runs 5
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+REPO_DIR = os.path.dirname(BENCH_DIR)
+
+HEAVY_MODULES = ("pandas", "pyarrow", "plotly.express", "tabula")
+
+RUN_ONCE = """
+import json, logging, sys, time
+logging.disable(logging.WARNING)
+start = time.perf_counter()
+from streamlit.testing.v1 import AppTest
+imported = time.perf_counter()
+at = AppTest.from_file({main!r}, default_timeout=60).run()
+finished = time.perf_counter()
+print(json.dumps({{
+    "streamlit_import": imported - start,
+    "first_run": finished - imported,
+    "total": finished - start,
+    "exception": bool(at.exception),
+    "loaded": [name for name in {modules!r} if name in sys.modules],
+}}))
+"""
+
+
+def run_once(workdir):
+    code = RUN_ONCE.format(main=os.path.join(REPO_DIR, "main.py"), modules=HEAVY_MODULES)
+    env = dict(os.environ, PYTHONPATH=REPO_DIR)
+    output = subprocess.run([sys.executable, "-c", code], cwd=workdir, env=env,
+                            capture_output=True, text=True, check=True).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the Finance App cold start.")
+    parser.add_argument("--runs", type=int, default=5)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as workdir:
+        runs = [run_once(workdir) for _ in range(args.runs)]
+
+    if any(run["exception"] for run in runs):
+        print("main.py raised during the first run", file=sys.stderr)
+        return 1
+    for key in ("streamlit_import", "first_run", "total"):
+        print(f"{key:>16}: median {statistics.median(run[key] for run in runs):.3f}s")
+    print(f"{'heavy modules':>16}: {', '.join(runs[-1]['loaded']) or 'none'}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
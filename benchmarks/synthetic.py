@@ -0,0 +1,107 @@
+"""Generate synthetic bank statements and category sets shaped like Apr-May-Statements.csv.
+
+    python benchmarks/synthetic.py --rows 100000 --keywords 1000 --out /tmp/bench
+"""
+import argparse
+import json
+import os
+
+import numpy as np
+import pandas as pd
+
+MERCHANTS = [
+    "grow w-bse.grow w", "gpay-creditcard", "SWIGGY", "ZOMATO", "UBER INDIA", "OLA CABS",
+    "AMAZON PA YMENTS", "FLIPKART", "IRCTC", "NETFLIX", "SPOTIFY", "LIC OF INDIA",
+    "BIGBASKET", "DMART", "RELIANCE JIO", "AIRTEL", "BESCOM", "HDFC ERGO", "MAKEMYTRIP", "INDIGO",
+]
+BANKS = ["HDFC BA NK\r\nLTD", "ICICI BA NK", "A XIS\r\nBA NK", "SBI", "KOTAK\r\nMAHINDRA"]
+BANK_CODES = ["ICI", "HDF", "A XB", "SBI", "KKB"]
+
+
+def generate_statement(rows, start="2022-04-01", seed=0, opening_balance=50_000.0):
+    """Return a raw statement frame with text columns, as it would be read from a bank CSV export."""
+    rng = np.random.default_rng(seed)
+    # Roughly 8 transactions a day, capped at three years so large exports look like
+    # a busy business account rather than decades of history; sorted like a real export.
+    span = max(1, min(rows // 8, 3 * 365))
+    days = pd.Timestamp(start) + pd.to_timedelta(np.sort(rng.integers(0, span, rows)), unit="D")
+
+    merchants = rng.integers(0, len(MERCHANTS), rows)
+    banks = rng.integers(0, len(BANKS), rows)
+    references = rng.integers(10**11, 10**12, rows)
+    suffixes = [f"{code}{value:030x}"[:30] for code, value in
+                zip(np.take(BANK_CODES, banks), rng.integers(0, 2**62, rows))]
+    particulars = [
+        f"UPI/{MERCHANTS[m]}/Payment request/{BANKS[b]}/{ref}/{suffix}"
+        for m, b, ref, suffix in zip(merchants, banks, references, suffixes)
+    ]
+
+    is_deposit = rng.random(rows) < 0.15
+    amounts = np.round(rng.lognormal(mean=5.5, sigma=1.2, size=rows), 2)
+    signed = np.where(is_deposit, amounts * 4, -amounts)
+    balance = np.round(opening_balance + np.cumsum(signed), 2)
+
+    def money(values):
+        return [f"{value:,.2f}" for value in values]
+
+    deposits = np.full(rows, "", dtype=object)
+    withdrawals = np.full(rows, "", dtype=object)
+    deposits[is_deposit] = money(amounts[is_deposit] * 4)
+    withdrawals[~is_deposit] = money(amounts[~is_deposit])
+
+    return pd.DataFrame({
+        "DATE": days.strftime("%d-%m-%Y"),
+        "PARTICULARS": particulars,
+        "DEPOSITS": deposits,
+        "WITHDRAWALS": withdrawals,
+        "BALANCE": money(balance),
+        "CATEGORY": "",
+    })
+
+
+def generate_categories(statement, keywords, seed=0):
+    """Build a categories.json mapping with the given number of keywords.
+
+    Half the keywords are full PARTICULARS strings taken from the statement (the
+    way the app learns them), the rest are merchant substrings and unmatched noise.
+    """
+    rng = np.random.default_rng(seed)
+    names = ["Food", "Travel-Local", "Travel-Outside", "Insurance", "Subscriptions", "Investment",
+             "Shopping", "Utilities", "Groceries", "Entertainment"]
+    categories = {"Uncategorised": []}
+    categories.update({name: [] for name in names})
+
+    exact = statement["PARTICULARS"].sample(
+        n=min(keywords // 2, len(statement)), random_state=seed
+    ).tolist()
+    substrings = MERCHANTS[: min(len(MERCHANTS), keywords - len(exact))]
+    noise = [f"NOISE/{value:012d}" for value in
+             rng.integers(0, 10**12, max(0, keywords - len(exact) - len(substrings)))]
+
+    for i, keyword in enumerate(exact + substrings + noise):
+        categories[names[i % len(names)]].append(keyword)
+    return categories
+
+
+def write_statement(path, rows, seed=0):
+    generate_statement(rows, seed=seed).to_csv(path, index=False)
+    return path
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rows", type=int, default=1000)
+    parser.add_argument("--keywords", type=int, default=100)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--out", default=".")
+    args = parser.parse_args()
+
+    os.makedirs(args.out, exist_ok=True)
+    statement = generate_statement(args.rows, seed=args.seed)
+    statement.to_csv(os.path.join(args.out, f"statement-{args.rows}.csv"), index=False)
+    with open(os.path.join(args.out, f"categories-{args.keywords}.json"), "w") as f:
+        json.dump(generate_categories(statement, args.keywords, seed=args.seed), f)
+
+
+if __name__ == "__main__":
+    main()
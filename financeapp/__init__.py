@@ -0,0 +1,49 @@
+"""Statement processing core of the Finance App, usable without Streamlit.
+
+Exports are resolved on first access so that ``import financeapp`` does not pull
+in pandas, pyarrow or tabula until something actually needs them.
+"""
+import importlib
+
+_EXPORTS = {
+    "CategoryMatcher": "categorise",
+    "CategoryStore": "category_store",
+    "REQUIRED_COLUMNS": "ingest",
+    "SpendingAnalytics": "analytics",
+    "PdfPasswordError": "pdf_tables",
+    "StatementCache": "cache",
+    "StatementError": "ingest",
+    "StatementSummary": "aggregates",
+    "TransactionAggregates": "aggregates",
+    "build_category_matcher": "categorise",
+    "categorise_transaction": "categorise",
+    "compact_keywords": "categorise",
+    "filter_transactions": "paging",
+    "freeze_categories": "categorise",
+    "ingest_csv_in_chunks": "ingest",
+    "load_statement": "ingest",
+    "merchant_key": "categorise",
+    "normalise_transactions": "ingest",
+    "sniff_date_format": "ingest",
+    "window_transactions": "paging",
+}
+_SUBMODULES = {
+    "accounts", "aggregates", "analytics", "cache", "categorise", "category_store", "cli", "ingest",
+    "metrics", "paging", "pdf_tables", "pdf_text", "transaction_store",
+}
+
+__all__ = sorted(_EXPORTS)
+
+
+def __getattr__(name):
+    if name in _SUBMODULES:
+        return importlib.import_module(f".{name}", __name__)
+    if name not in _EXPORTS:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    value = getattr(importlib.import_module(f".{_EXPORTS[name]}", __name__), name)
+    globals()[name] = value
+    return value
+
+
+def __dir__():
+    return sorted(set(globals()) | set(_EXPORTS) | _SUBMODULES)
@@ -0,0 +1,213 @@
+"""Combine several statements, possibly of several accounts, into one frame.
+
+Statements of the same account often overlap (an "Apr-May" and a "May-Jun"
+export both hold May). A transaction is identified across files by its date,
+amounts and the running balance after it, which stays the same however the
+bank formatted PARTICULARS in each export.
+"""
+import contextvars
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+import pandas as pd
+
+from . import metrics
+from .aggregates import StatementSummary
+from .categorise import categorise_transaction
+from .ingest import CSV_CHUNK_ROWS, iter_csv_chunks, load_statement
+
+MATCH_COLUMNS = ["DATE", "DEPOSITS", "WITHDRAWALS", "BALANCE"]
+BALANCE_TOLERANCE = 0.005
+
+
+def load_statements(files, workers=4, on_loaded=None, **kwargs):
+    """Read and normalise several statements concurrently.
+
+    Returns a list in the order of files with a DataFrame, or the exception that
+    file raised, for each. on_loaded(index, result) is called from the calling
+    thread as each file finishes, e.g. to report progress. PDFs still extract
+    in the PDF worker processes; CSV parsing runs on the threads.
+    """
+    results = [None] * len(files)
+    with ThreadPoolExecutor(max_workers=max(1, min(workers, len(files)))) as pool:
+        # Each file runs in a copy of the caller's context, so its stages reach the caller's metrics.collect().
+        futures = {pool.submit(contextvars.copy_context().run, load_statement, file, **kwargs): index
+                   for index, file in enumerate(files)}
+        for future in as_completed(futures):
+            index = futures[future]
+            try:
+                results[index] = future.result()
+            except Exception as e:
+                results[index] = e
+            if on_loaded is not None:
+                on_loaded(index, results[index])
+    return results
+
+
+def _keys(df):
+    return df[MATCH_COLUMNS].fillna({"DEPOSITS": 0.0, "WITHDRAWALS": 0.0}).round(2)
+
+
+def _edge_balance(day, opening):
+    # Rows are in date order only, so within the day we look for the balance no
+    # other row of the day leads from (opening) or to (closing).
+    keys = _keys(day)
+    before = (keys["BALANCE"] - keys["DEPOSITS"] + keys["WITHDRAWALS"]).round(2)
+    after = keys["BALANCE"]
+    candidates = before[~before.isin(after)] if opening else after[~after.isin(before)]
+    if len(candidates) == 1:
+        return float(candidates.iloc[0])
+    return float(before.iloc[0] if opening else after.iloc[-1])
+
+
+def statement_span(df):
+    """(first date, last date, opening balance, closing balance) of a statement, or None.
+
+    Works for statements listed oldest-first or newest-first.
+    """
+    dated = df.dropna(subset=["DATE", "BALANCE"])
+    if dated.empty:
+        return None
+    first, last = dated["DATE"].min(), dated["DATE"].max()
+    return (first, last, _edge_balance(dated[dated["DATE"] == first], opening=True),
+            _edge_balance(dated[dated["DATE"] == last], opening=False))
+
+
+def _continues(earlier, later):
+    return (earlier is not None and later is not None and earlier[1] <= later[0]
+            and abs(earlier[3] - later[2]) < BALANCE_TOLERANCE)
+
+
+def guess_accounts(frames):
+    """Label each statement with an account, grouping statements that belong together.
+
+    Two statements are taken to be of the same account when they share a
+    transaction or when one opens at the balance the other closed with.
+    Returns labels "Account 1", "Account 2", ... in order of first appearance.
+    """
+    parent = list(range(len(frames)))
+
+    def find(i):
+        while parent[i] != i:
+            parent[i] = parent[parent[i]]
+            i = parent[i]
+        return i
+
+    keys = [set(_keys(df).itertuples(index=False, name=None)) for df in frames]
+    spans = [statement_span(df) for df in frames]
+    for i in range(len(frames)):
+        for j in range(i + 1, len(frames)):
+            if (keys[i] & keys[j] or _continues(spans[i], spans[j])
+                    or _continues(spans[j], spans[i])):
+                parent[find(j)] = find(i)
+
+    labels, names = [], {}
+    for i in range(len(frames)):
+        root = find(i)
+        names.setdefault(root, f"Account {len(names) + 1}")
+        labels.append(names[root])
+    return labels
+
+
+@metrics.timed("combine")
+def combine_statements(frames, accounts):
+    """Merge normalised statements into one frame with an ACCOUNT column.
+
+    Within an account, statements are taken in date order and rows already
+    seen in an earlier statement are dropped. The result is in date order.
+    df.attrs["duplicates"] holds how many rows each input lost to overlaps (in
+    the order given), and df.attrs["gaps"] maps each account to the (last date,
+    next first date) pairs between consecutive statements that neither overlap
+    nor continue each other's balance, which usually means one is missing.
+    """
+    duplicates = [0] * len(frames)
+    gaps = {}
+    combined = []
+    spans = [statement_span(df) for df in frames]
+    for account in dict.fromkeys(accounts):
+        members = [i for i, label in enumerate(accounts) if label == account]
+        # Statements without a single dated balance go last and are only de-duplicated.
+        members.sort(key=lambda i: (spans[i] is None, spans[i][:2] if spans[i] else ()))
+        gaps[account] = []
+        seen = None
+        parts = []
+        for position, i in enumerate(members):
+            df = frames[i]
+            keys = _keys(df)
+            if seen is not None:
+                # Anti-join on the match columns against the rows kept so far.
+                merged = keys.merge(seen, on=MATCH_COLUMNS, how="left", indicator=True)
+                fresh = (merged["_merge"] == "left_only").to_numpy()
+                duplicates[i] = len(df) - int(fresh.sum())
+                previous = spans[members[position - 1]]
+                if (not duplicates[i] and previous is not None and spans[i] is not None
+                        and not _continues(previous, spans[i])):
+                    gaps[account].append((previous[1], spans[i][0]))
+                df = df[fresh]
+                keys = keys[fresh]
+            parts.append(df)
+            seen = keys.drop_duplicates() if seen is None else pd.concat([seen, keys]).drop_duplicates()
+        combined.append(pd.concat(parts).assign(ACCOUNT=account))
+
+    # Stable, so same-day rows keep statement order.
+    df = pd.concat(combined, ignore_index=True).sort_values("DATE", kind="stable", ignore_index=True)
+    df.attrs["duplicates"] = duplicates
+    df.attrs["gaps"] = gaps
+    return df
+
+
+def _rows_between(file, ranges, categories, chunksize):
+    """The categorised rows of a CSV statement dated within any of the (first, last) ranges, or None."""
+    parts = []
+    for chunk in iter_csv_chunks(file, chunksize):
+        inside = pd.Series(False, index=chunk.index)
+        for first, last in ranges:
+            inside |= chunk["DATE"].between(first, last)
+        if inside.any():
+            parts.append(chunk[inside])
+    if not parts:
+        return None
+    return categorise_transaction(pd.concat(parts, ignore_index=True), categories)
+
+
+@metrics.timed("merge_summaries")
+def merge_summaries(files, summaries, categories, chunksize=CSV_CHUNK_ROWS):
+    """One StatementSummary for CSV statements ingested chunk by chunk, counting shared rows once.
+
+    As in combine_statements, statements are taken in date order and a row of a
+    later statement that matches a row of an earlier one on MATCH_COLUMNS is
+    dropped; all of them are treated as one account. The summaries only hold
+    totals, so files whose dates overlap are read again, keeping just the rows
+    inside the overlaps, and the later statement's copies are taken back out.
+    categories must be the ones the summaries were built with.
+    """
+    spans = [(summary.first_date, summary.last_date) for summary in summaries]
+    order = sorted((i for i, span in enumerate(spans) if span[0] is not None), key=lambda i: spans[i])
+    # Merged in date order, so on a day two statements share the later one's closing balance wins.
+    merged = StatementSummary.merge([summaries[i] for i in order]
+                                    + [summary for summary in summaries if summary.first_date is None])
+
+    # The dates of each statement that an earlier statement also covers.
+    overlaps, reach = {}, None
+    for i in order:
+        first, last = spans[i]
+        if reach is not None and first <= reach:
+            overlaps[i] = (first, min(last, reach))
+        reach = last if reach is None else max(reach, last)
+    if not overlaps:
+        return merged
+
+    seen = None
+    for i in order:
+        ranges = [overlap for overlap in overlaps.values()
+                  if spans[i][0] <= overlap[1] and spans[i][1] >= overlap[0]]
+        rows = _rows_between(files[i], ranges, categories, chunksize) if ranges else None
+        if rows is None:
+            continue
+        keys = _keys(rows)
+        if seen is not None and i in overlaps:
+            merged_keys = keys.merge(seen, on=MATCH_COLUMNS, how="left", indicator=True)
+            shared = (merged_keys["_merge"] == "both").to_numpy()
+            merged.remove(rows[shared])
+            keys = keys[~shared]
+        seen = keys.drop_duplicates() if seen is None else pd.concat([seen, keys]).drop_duplicates()
+    return merged
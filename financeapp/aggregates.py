@@ -0,0 +1,198 @@
+import pandas as pd
+
+from . import metrics
+from .categorise import category_changes, plain_index
+
+
+def _sum_by(values, keys):
+    """values summed per key, with only the categories that occur."""
+    totals = values.groupby(keys, observed=True).sum()
+    return totals.set_axis(plain_index(totals.index))
+
+
+def _count(categories):
+    counts = categories.value_counts()
+    counts = counts[counts > 0]
+    return counts.set_axis(plain_index(counts.index))
+
+
+class TransactionAggregates:
+    """Per-category, per-day and per-month rollups of a categorised statement.
+
+    Built once per statement; category edits are folded in by update_categories,
+    which only touches the rows whose CATEGORY actually changed. When df has an
+    ACCOUNT column with several accounts, the daily BALANCE is the sum of each
+    account's latest balance and account_balances holds them per account.
+    """
+
+    @metrics.timed("aggregate")
+    def __init__(self, df):
+        self.categories = df["CATEGORY"].copy()
+        self.withdrawals = df["WITHDRAWALS"].fillna(0.0)
+        self.months = df["DATE"].dt.to_period("M")
+        self.total_deposits = float(df["DEPOSITS"].sum())
+
+        self.by_category = _sum_by(self.withdrawals, self.categories)
+        self.category_counts = _count(self.categories)
+        self.by_month_category = _sum_by(self.withdrawals, [self.months, self.categories])
+
+        dated = df.dropna(subset=["DATE"])
+        self.by_day = dated.groupby(pd.Grouper(key="DATE", freq="D")).agg(
+            DEPOSITS=("DEPOSITS", "sum"),
+            WITHDRAWALS=("WITHDRAWALS", "sum"),
+            BALANCE=("BALANCE", "last"),
+        )
+        self.by_account = None
+        self.account_balances = None
+        if "ACCOUNT" in df and df["ACCOUNT"].nunique() > 1:
+            self.by_account = df.groupby("ACCOUNT", sort=False)[["DEPOSITS", "WITHDRAWALS"]].sum()
+            # An account keeps its last balance on days it has no transactions,
+            # so the total only counts accounts from their first statement on.
+            balances = dated.groupby(["ACCOUNT", pd.Grouper(key="DATE", freq="D")], sort=False)["BALANCE"].last()
+            self.account_balances = (balances.unstack("ACCOUNT")
+                                     .reindex(self.by_day.index)
+                                     .ffill())
+            self.by_day["BALANCE"] = self.account_balances.sum(axis=1, min_count=1)
+        self.by_month = self.by_day.resample("MS").agg(
+            {"DEPOSITS": "sum", "WITHDRAWALS": "sum", "BALANCE": "last"}
+        )
+
+        self.version = 0
+        self._figures = {}
+
+    @metrics.timed("aggregate_update")
+    def update_categories(self, categories):
+        """Apply a new CATEGORY column, returning how many rows moved category."""
+        categories = categories.reindex(self.categories.index)
+        changed = category_changes(self.categories, categories)
+        if not changed.any():
+            return 0
+
+        amounts = self.withdrawals[changed]
+        old = self.categories[changed]
+        new = categories[changed]
+        months = self.months[changed]
+
+        self.by_category = (self.by_category
+                            .sub(_sum_by(amounts, old), fill_value=0)
+                            .add(_sum_by(amounts, new), fill_value=0))
+        self.category_counts = (self.category_counts
+                                .sub(_count(old), fill_value=0)
+                                .add(_count(new), fill_value=0))
+        self.by_month_category = (self.by_month_category
+                                  .sub(_sum_by(amounts, [months, old]), fill_value=0)
+                                  .add(_sum_by(amounts, [months, new]), fill_value=0))
+
+        # Categories left without any rows disappear, as they would from a fresh groupby.
+        empty = self.category_counts[self.category_counts <= 0].index
+        self.category_counts = self.category_counts.drop(empty)
+        self.by_category = self.by_category.drop(empty, errors="ignore")
+        self.by_month_category = self.by_month_category[
+            ~self.by_month_category.index.get_level_values(1).isin(empty)
+        ]
+
+        # Replaced rather than written into, since new may hold categories the old column lacks.
+        self.categories = categories
+        self.version += 1
+        self._figures.clear()
+        return int(changed.sum())
+
+    def category_totals(self):
+        totals = self.by_category.rename_axis("CATEGORY").rename("WITHDRAWALS").reset_index()
+        return totals.sort_values("WITHDRAWALS", ascending=False)
+
+    def daily_balance(self, by_account=False):
+        """DATE and DAILY BALANCE rows; with by_account, one row per account and day with an ACCOUNT column."""
+        if by_account and self.account_balances is not None:
+            return (self.account_balances.rename_axis(columns="ACCOUNT")
+                    .stack().rename("DAILY BALANCE").reset_index())
+        return self.by_day["BALANCE"].rename("DAILY BALANCE").reset_index()
+
+    def account_totals(self):
+        """DEPOSITS and WITHDRAWALS per ACCOUNT, or None for a single account."""
+        if self.by_account is None:
+            return None
+        return self.by_account.reset_index()
+
+    def figure(self, name, build):
+        """Return a cached chart, rebuilding it only after the rollups change."""
+        if name not in self._figures:
+            with metrics.stage("chart", chart=name):
+                self._figures[name] = build()
+        return self._figures[name]
+
+
+class StatementSummary:
+    """Running totals for a statement that is ingested chunk by chunk."""
+
+    def __init__(self):
+        self.statements = 1
+        self.rows = 0
+        self.total_deposits = 0.0
+        self.category_totals = pd.Series(dtype="float64")
+        self.daily_balance = pd.Series(dtype="float64")
+        self.coercion_failures = {}
+        # Dates of the first and last dated rows, or None before any.
+        self.first_date = None
+        self.last_date = None
+
+    def update(self, chunk):
+        self.rows += len(chunk)
+        self.total_deposits += float(chunk["DEPOSITS"].sum())
+        self.category_totals = self.category_totals.add(
+            _sum_by(chunk["WITHDRAWALS"], chunk["CATEGORY"]), fill_value=0
+        )
+        # A later chunk's closing balance for a day replaces an earlier one, which is
+        # what a last-per-day resample over the whole statement would give.
+        dated = chunk.dropna(subset=["DATE"])
+        daily = dated.groupby(dated["DATE"].dt.normalize())["BALANCE"].last()
+        self.daily_balance = daily.combine_first(self.daily_balance)
+        if not dated.empty:
+            self._extend_span(dated["DATE"].min(), dated["DATE"].max())
+        for col, count in chunk.attrs.get("coercion_failures", {}).items():
+            self.coercion_failures[col] = self.coercion_failures.get(col, 0) + count
+
+    def _extend_span(self, first, last):
+        self.first_date = first if self.first_date is None else min(self.first_date, first)
+        self.last_date = last if self.last_date is None else max(self.last_date, last)
+
+    def remove(self, rows):
+        """Take categorised rows (counted in update() before) back out of the totals."""
+        self.rows -= len(rows)
+        self.total_deposits -= float(rows["DEPOSITS"].sum())
+        self.category_totals = self.category_totals.sub(
+            _sum_by(rows["WITHDRAWALS"], rows["CATEGORY"]), fill_value=0
+        )
+
+    @classmethod
+    def merge(cls, summaries):
+        """One summary for several statements, taken in order.
+
+        Totals are simply added, so rows shared by overlapping statements count
+        once per statement; accounts.merge_summaries() takes them out. Daily
+        balances are treated as one account's: where statements share a day,
+        the later statement's closing balance wins.
+        """
+        merged = cls()
+        merged.statements = 0
+        for summary in summaries:
+            merged.statements += summary.statements
+            merged.rows += summary.rows
+            merged.total_deposits += summary.total_deposits
+            merged.category_totals = merged.category_totals.add(summary.category_totals, fill_value=0)
+            merged.daily_balance = summary.daily_balance.combine_first(merged.daily_balance)
+            if summary.first_date is not None:
+                merged._extend_span(summary.first_date, summary.last_date)
+            for col, count in summary.coercion_failures.items():
+                merged.coercion_failures[col] = merged.coercion_failures.get(col, 0) + count
+        return merged
+
+    def category_totals_frame(self):
+        totals = self.category_totals.rename_axis("CATEGORY").rename("WITHDRAWALS").reset_index()
+        return totals.sort_values("WITHDRAWALS", ascending=False)
+
+    def daily_balance_frame(self):
+        daily = self.daily_balance.sort_index()
+        if not daily.empty:
+            daily = daily.asfreq("D")
+        return daily.rename_axis("DATE").rename("DAILY BALANCE").reset_index()
@@ -0,0 +1,207 @@
+"""Spending over time: weekly and monthly category spend, rolling averages,
+budgets and unusual withdrawals.
+
+SpendingAnalytics keeps partial rollups per month (and week within the month)
+of a categorised statement. update() recomputes only the months present in
+the frame it is given, so adding a month of transactions or re-categorising a
+few rows never touches the other months' rows, and the rolling averages are
+only recomputed for the windows that include a changed month. refresh() does
+the same for a whole new frame whose changed months are known, such as the
+stored history after an append.
+"""
+import json
+import os
+
+import numpy as np
+import pandas as pd
+
+from . import metrics
+from .categorise import category_changes, plain_index
+
+ROLLING_MONTHS = 3
+# A withdrawal is unusual when its log amount is this many standard deviations
+# above its category's mean; categories with fewer withdrawals are not judged.
+OUTLIER_Z = 3.0
+OUTLIER_MIN_COUNT = 5
+
+_PART_INDEX = ["MONTH", "WEEK", "CATEGORY"]
+_PART_COLUMNS = ["SPENT", "COUNT", "LOG_SUM", "LOG_SQUARES"]
+
+
+def _month_parts(df):
+    """Withdrawal sum, count and log-amount sums per (month, week, category)."""
+    spent = df.loc[df["DATE"].notna() & (df["WITHDRAWALS"] > 0), ["DATE", "CATEGORY", "WITHDRAWALS"]]
+    if spent.empty:
+        return pd.DataFrame(columns=_PART_COLUMNS,
+                            index=pd.MultiIndex.from_arrays([[], [], []], names=_PART_INDEX))
+    amounts = spent["WITHDRAWALS"]
+    logs = np.log(amounts)
+    values = pd.DataFrame({"SPENT": amounts, "COUNT": 1, "LOG_SUM": logs, "LOG_SQUARES": logs * logs})
+    keys = [spent["DATE"].dt.to_period("M").rename("MONTH"),
+            spent["DATE"].dt.to_period("W").rename("WEEK"),
+            spent["CATEGORY"]]
+    parts = values.groupby(keys, sort=False, observed=True).sum()
+    return parts.set_axis(plain_index(parts.index))
+
+
+class SpendingAnalytics:
+    """Monthly and weekly spend per category, rolling averages and outlier statistics.
+
+    monthly and rolling are frames with one row per month (every month in the
+    range, months without spend as 0) and one column per category; a rolling
+    value is the mean over the last window months, fewer at the start.
+    """
+
+    def __init__(self, df=None, window=ROLLING_MONTHS):
+        self.window = window
+        self.parts = _month_parts(pd.DataFrame(columns=["DATE", "CATEGORY", "WITHDRAWALS"]))
+        self.monthly = pd.DataFrame(index=pd.PeriodIndex([], freq="M", name="MONTH"))
+        self.rolling = self.monthly.copy()
+        self.categories = pd.Series(dtype=object)
+        self.version = 0
+        if df is not None:
+            self.update(df)
+
+    @metrics.timed("analytics_update")
+    def update(self, df):
+        """Replace the rollups of every month in df with df's rows for that month.
+
+        df must hold all of the transactions of the months it covers. Returns
+        the months that were recomputed.
+        """
+        months = pd.PeriodIndex(df["DATE"].dropna().dt.to_period("M").unique(), freq="M").sort_values()
+        if months.empty:
+            return months
+        new_parts = _month_parts(df)
+        kept = self.parts[~self.parts.index.get_level_values("MONTH").isin(months)]
+        self.parts = pd.concat([kept, new_parts]) if not kept.empty else new_parts
+
+        first = months[0] if self.monthly.empty else min(months[0], self.monthly.index[0])
+        last = months[-1] if self.monthly.empty else max(months[-1], self.monthly.index[-1])
+        index = pd.period_range(first, last, freq="M", name="MONTH")
+        new_monthly = new_parts["SPENT"].groupby(level=["MONTH", "CATEGORY"]).sum().unstack("CATEGORY")
+        columns = self.monthly.columns.union(new_monthly.columns, sort=False)
+        # Months that were not there before (including gaps filled with 0) count as changed.
+        changed = months.union(index.difference(self.monthly.index))
+        monthly = self.monthly.reindex(index=index, columns=columns, fill_value=0.0)
+        monthly.loc[months] = new_monthly.reindex(index=months, columns=columns).fillna(0.0).to_numpy()
+        self.monthly = monthly.astype("float64")
+
+        # A month's rolling value only depends on the window months before it.
+        start, end = changed[0], min(changed[-1] + (self.window - 1), index[-1])
+        rolled = (self.monthly.loc[max(start - (self.window - 1), index[0]):end]
+                  .rolling(self.window, min_periods=1).mean().loc[start:])
+        self.rolling = self.rolling.reindex(index=index, columns=columns, fill_value=0.0)
+        self.rolling.loc[rolled.index] = rolled.to_numpy()
+
+        dated = df["DATE"].notna()
+        kept = self.categories[~self.categories.index.isin(df.index[dated])]
+        # Concatenating only non-empty parts keeps CATEGORY's dtype.
+        self.categories = (pd.concat([kept, df.loc[dated, "CATEGORY"]]) if not kept.empty
+                           else df.loc[dated, "CATEGORY"].copy())
+        self.version += 1
+        return months
+
+    def refresh(self, df, months):
+        """Follow df, a new frame that only differs from the last one in months' rows.
+
+        Unlike update(), df is the whole frame, e.g. the stored history after an
+        append, and its row labels replace the old ones, which an append shifts.
+        Returns the months that were recomputed.
+        """
+        months = pd.PeriodIndex(months, freq="M")
+        changed = self.update(df[df["DATE"].dt.to_period("M").isin(months)])
+        self.categories = df.loc[df["DATE"].notna(), "CATEGORY"].copy()
+        return changed
+
+    def update_categories(self, df):
+        """Fold in CATEGORY edits of df (the frame the rollups were built from).
+
+        Only the months with a changed row are recomputed. Returns them.
+        """
+        current = df["CATEGORY"].reindex(self.categories.index)
+        changed = category_changes(self.categories, current)
+        if not changed.any():
+            return pd.PeriodIndex([], freq="M")
+        months = df.loc[changed[changed].index, "DATE"].dt.to_period("M").unique()
+        return self.update(df[df["DATE"].dt.to_period("M").isin(months)])
+
+    def weekly(self):
+        """Spend per week (rows, every week in the range) and category (columns)."""
+        weekly = self.parts["SPENT"].groupby(level=["WEEK", "CATEGORY"]).sum().unstack("CATEGORY", fill_value=0.0)
+        if weekly.empty:
+            return weekly
+        weekly = weekly.sort_index()
+        return weekly.reindex(pd.period_range(weekly.index[0], weekly.index[-1], freq="W", name="WEEK"),
+                              fill_value=0.0)
+
+    def spend(self, freq="M"):
+        """Long frame of PERIOD, CATEGORY, SPENT and, monthly, ROLLING AVERAGE, without empty cells."""
+        if freq == "W":
+            long = self.weekly().rename_axis("PERIOD").stack().rename("SPENT").reset_index()
+        else:
+            wide = {"SPENT": self.monthly, "ROLLING AVERAGE": self.rolling}
+            long = pd.concat({name: frame.stack() for name, frame in wide.items()}, axis=1)
+            long = long.rename_axis(["PERIOD", "CATEGORY"]).reset_index()
+        long = long[long["SPENT"] > 0] if freq == "W" else long[(long["SPENT"] > 0) | (long["ROLLING AVERAGE"] > 0)]
+        return long.assign(PERIOD=long["PERIOD"].dt.start_time)
+
+    def budget_report(self, budgets, month=None):
+        """Budget against actual spend per budgeted category for month (default: the latest).
+
+        Columns: CATEGORY, BUDGET, SPENT, REMAINING, USED (share of the budget)
+        and ROLLING AVERAGE, the typical month for comparison.
+        """
+        budgets = {category: float(amount) for category, amount in budgets.items() if amount}
+        columns = ["CATEGORY", "BUDGET", "SPENT", "REMAINING", "USED", "ROLLING AVERAGE"]
+        if not budgets or self.monthly.empty:
+            return pd.DataFrame(columns=columns)
+        month = self.monthly.index[-1] if month is None else pd.Period(month, freq="M")
+        report = pd.DataFrame({"BUDGET": pd.Series(budgets)}).rename_axis("CATEGORY")
+        report["SPENT"] = self.monthly.loc[month].reindex(report.index, fill_value=0.0) \
+            if month in self.monthly.index else 0.0
+        report["REMAINING"] = report["BUDGET"] - report["SPENT"]
+        report["USED"] = report["SPENT"] / report["BUDGET"]
+        report["ROLLING AVERAGE"] = self.rolling.loc[month].reindex(report.index, fill_value=0.0) \
+            if month in self.rolling.index else 0.0
+        return report.reset_index().sort_values("USED", ascending=False)[columns]
+
+    def category_statistics(self):
+        """COUNT, MEAN and STD of the log withdrawal amount per category."""
+        totals = self.parts.groupby(level="CATEGORY")[["COUNT", "LOG_SUM", "LOG_SQUARES"]].sum()
+        mean = totals["LOG_SUM"] / totals["COUNT"]
+        variance = (totals["LOG_SQUARES"] / totals["COUNT"] - mean * mean).clip(lower=0)
+        # Sample variance, from the running sums.
+        variance *= totals["COUNT"] / (totals["COUNT"] - 1).where(totals["COUNT"] > 1)
+        return pd.DataFrame({"COUNT": totals["COUNT"], "MEAN": mean, "STD": np.sqrt(variance)})
+
+    def outlier_scores(self, df, min_count=OUTLIER_MIN_COUNT):
+        """z-score of each withdrawal's log amount within its category, NaN where it cannot be judged."""
+        stats = self.category_statistics()
+        stats = stats[(stats["COUNT"] >= min_count) & (stats["STD"] > 0)]
+        amounts = df["WITHDRAWALS"].where(df["WITHDRAWALS"] > 0)
+        # Mapping a categorical gives a categorical of the means, hence the cast.
+        mean = df["CATEGORY"].map(stats["MEAN"]).astype("float64")
+        std = df["CATEGORY"].map(stats["STD"]).astype("float64")
+        return (np.log(amounts) - mean) / std
+
+    def outliers(self, df, threshold=OUTLIER_Z, min_count=OUTLIER_MIN_COUNT):
+        """The rows of df whose withdrawal is unusually large for its category, with a Z column."""
+        scores = self.outlier_scores(df, min_count)
+        flagged = scores > threshold
+        return df.loc[flagged].assign(Z=scores[flagged]).sort_values("Z", ascending=False)
+
+
+def load_budgets(path="budgets.json"):
+    """Monthly budget per category from a JSON file; {} if there is none."""
+    if not os.path.exists(path):
+        return {}
+    with open(path) as f:
+        return json.load(f)
+
+
+def save_budgets(budgets, path="budgets.json"):
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, "w") as f:
+        json.dump(budgets, f)
+    os.replace(tmp_path, path)
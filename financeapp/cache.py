@@ -0,0 +1,32 @@
+import threading
+from collections import OrderedDict
+
+
+class StatementCache:
+    """LRU cache of normalised statements keyed by a hash of the uploaded bytes."""
+
+    def __init__(self, max_entries=16, max_bytes=256 * 1024 * 1024):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self._entries = OrderedDict()
+        self._sizes = {}
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            if key not in self._entries:
+                return None
+            self._entries.move_to_end(key)
+            return self._entries[key]
+
+    def put(self, key, df):
+        size = int(df.memory_usage(deep=True).sum())
+        if size > self.max_bytes:
+            return
+        with self._lock:
+            self._entries[key] = df
+            self._entries.move_to_end(key)
+            self._sizes[key] = size
+            while len(self._entries) > self.max_entries or sum(self._sizes.values()) > self.max_bytes:
+                evicted, _ = self._entries.popitem(last=False)
+                del self._sizes[evicted]
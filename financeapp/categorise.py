@@ -0,0 +1,267 @@
+import functools
+import re
+
+from . import metrics
+
+# UPI/IMPS reference numbers and transaction ids: a segment with at least four
+# digits among hex characters, optionally after a short bank prefix
+# ("549851384442", "ICI1305fb78598e4c4c99f5093e19f5").
+_REFERENCE = r"[a-z]{0,6}(?:[0-9a-f]*[0-9]){4}[0-9a-f]*"
+# Applied in order to the lower-cased text. Bank exports split PARTICULARS on "/"
+# (UPI) or "-" (NEFT/IMPS) and kern words apart ("BA NK", "grow w"), so whitespace
+# is dropped and every separator becomes "//", giving each segment its own
+# delimiters for the reference pattern. The patterns are also valid RE2, so
+# merchant_keys() runs them as vectorised pyarrow kernels.
+_KEY_STEPS = [
+    (r"\s+", ""),
+    (r"[|:\-/]+", "//"),
+    (r"(?:^|/)" + _REFERENCE + r"(?:/|$)", ""),
+    (r"/+", "/"),
+]
+_COMPILED_KEY_STEPS = [(re.compile(pattern), replacement) for pattern, replacement in _KEY_STEPS]
+_TOKEN = re.compile(r"[a-z0-9]{3,}")
+# Tokens shared by most transactions of a payment channel; they never identify a merchant.
+STOP_TOKENS = frozenset({
+    "upi", "neft", "imps", "rtgs", "nach", "ecs", "payment", "request", "paymentrequest",
+    "bank", "ltd", "limited", "pvt", "private", "india", "transfer", "txn", "ref", "payments",
+})
+MIN_PREFIX = 3
+# Exports truncate words ("LIMITE/5115..."), so a prefix of a stop token says no more than the token.
+_STOP_PREFIXES = frozenset(stop[:end] for stop in STOP_TOKENS for end in range(MIN_PREFIX, len(stop) + 1))
+# Shorter keys ("i", "f") are what is left of a truncated name, not a merchant.
+MIN_KEY_LENGTH = 4
+_MEMO_LIMIT = 100_000
+
+
+def freeze_categories(categories):
+    """Hashable snapshot of a categories mapping, used as the matcher cache key."""
+    return tuple((category, tuple(keywords)) for category, keywords in categories.items())
+
+
+def merchant_key(particulars):
+    """Reduce a PARTICULARS string (or keyword) to what stays the same between payments.
+
+    Lower-cases, drops whitespace and line breaks, and removes reference numbers
+    and transaction ids, so "UPI/grow w-bse.grow w/Payment request/HDFC BA NK\\r\\nLTD/
+    549851384442/GPG 2025..." becomes "upi/groww/bse.groww/paymentrequest/hdfcbankltd"
+    for every payment to that merchant. Idempotent; "" if nothing but ids is left.
+    """
+    text = str(particulars).lower()
+    for pattern, replacement in _COMPILED_KEY_STEPS:
+        text = pattern.sub(replacement, text)
+    return text.strip("/")
+
+
+def merchant_keys(particulars):
+    """merchant_key() for a whole Series of strings, run in pyarrow rather than per row."""
+    text = particulars.astype("string[pyarrow]").str.lower()
+    for pattern, replacement in _KEY_STEPS:
+        text = text.str.replace(pattern, replacement, regex=True)
+    return text.str.strip("/").astype(object)
+
+
+def key_tokens(key):
+    """The merchant-identifying tokens of a merchant key."""
+    return frozenset(token for token in _TOKEN.findall(key) if token not in STOP_TOKENS)
+
+
+def is_merchant_key(key):
+    """Whether a merchant key identifies a merchant well enough to match other payments on."""
+    return len(key) >= MIN_KEY_LENGTH and any(token not in _STOP_PREFIXES for token in key_tokens(key))
+
+
+def learned_keyword(particulars):
+    """What to store for a PARTICULARS string (or keyword) a category was learned from.
+
+    Its merchant key when that identifies a merchant; otherwise the text itself,
+    which then only matches exactly, so "LIMITE/5115.../ICI..." does not claim
+    every other payment whose key is just "limite".
+    """
+    key = merchant_key(particulars)
+    if is_merchant_key(key):
+        return key
+    return particulars if particulars.strip() else ""
+
+
+def compact_keywords(categories):
+    """Return categories with every keyword reduced to its merchant key, without dead entries.
+
+    A key listed under several categories is kept only under the last one, which
+    is the one that wins when matching. Keywords without a usable merchant key
+    are kept as they are.
+    """
+    owner = {}
+    for category, keywords in categories.items():
+        for keyword in keywords:
+            owner[learned_keyword(keyword)] = category
+    compact = {category: [] for category in categories}
+    for key, category in owner.items():
+        if key:
+            compact[category].append(key)
+    return compact
+
+
+class CategoryMatcher:
+    """Keyword lookup for one categories snapshot.
+
+    Matching is tried in order: the exact PARTICULARS string, its merchant key,
+    then the token index, where a keyword matches when each of its tokens is a
+    prefix of a token of the transaction (the most specific keyword wins). With
+    min_similarity, a transaction that still has no match takes the category of
+    the keyword whose tokens overlap it most (Jaccard), if at least that much.
+    Categories are applied in file order, so when the same keyword appears under
+    several categories the one listed last wins.
+    """
+
+    def __init__(self, categories):
+        # Every category of the snapshot, Uncategorised first: the categories of the CATEGORY column.
+        self.names = ["Uncategorised"]
+        self.exact = {}
+        self.keys = {}
+        self._tokens = []
+        self._categories = []
+        self._rarest = {}
+        self._postings = {}
+        self._memo = {}
+
+        for category, keywords in categories:
+            if category != "Uncategorised":
+                self.names.append(category)
+            if category == "Uncategorised" or not keywords:
+                continue
+            for keyword in keywords:
+                self.exact[keyword] = category
+                key = merchant_key(keyword)
+                if is_merchant_key(key):
+                    self.keys[key] = category
+
+        frequency = {}
+        for key, category in self.keys.items():
+            tokens = key_tokens(key)
+            if not tokens:
+                continue
+            keyword_id = len(self._tokens)
+            self._tokens.append(tokens)
+            self._categories.append(category)
+            for token in tokens:
+                self._postings.setdefault(token, []).append(keyword_id)
+                frequency[token] = frequency.get(token, 0) + 1
+        # Each keyword is indexed under its rarest token only: any transaction it
+        # matches must contain that token, and rare tokens have short lists.
+        for keyword_id, tokens in enumerate(self._tokens):
+            rarest = min(tokens, key=lambda token: (frequency[token], token))
+            self._rarest.setdefault(rarest, []).append(keyword_id)
+
+    def _token_match(self, tokens):
+        prefixes = {token[:end] for token in tokens for end in range(MIN_PREFIX, len(token) + 1)}
+        best = None
+        for prefix in prefixes:
+            for keyword_id in self._rarest.get(prefix, ()):
+                if self._tokens[keyword_id] <= prefixes:
+                    rank = (len(self._tokens[keyword_id]), keyword_id)
+                    if best is None or rank > best:
+                        best = rank
+        return None if best is None else self._categories[best[1]]
+
+    def _similar(self, tokens, min_similarity):
+        best = None
+        for keyword_id in {keyword_id for token in tokens for keyword_id in self._postings.get(token, ())}:
+            keyword_tokens = self._tokens[keyword_id]
+            score = len(keyword_tokens & tokens) / len(keyword_tokens | tokens)
+            if score >= min_similarity and (best is None or (score, keyword_id) > best):
+                best = (score, keyword_id)
+        return None if best is None else self._categories[best[1]]
+
+    def match_key(self, key, min_similarity=None):
+        """Category for a transaction's merchant key, or None."""
+        memo_key = (key, min_similarity)
+        if memo_key in self._memo:
+            return self._memo[memo_key]
+        category = self.keys.get(key)
+        if category is None and key:
+            tokens = key_tokens(key)
+            category = self._token_match(tokens)
+            if category is None and min_similarity is not None and tokens:
+                category = self._similar(tokens, min_similarity)
+        if len(self._memo) >= _MEMO_LIMIT:
+            self._memo.clear()
+        self._memo[memo_key] = category
+        return category
+
+
+@metrics.timed("build_matcher")
+def build_category_matcher(categories):
+    """Build the CategoryMatcher for a frozen categories snapshot."""
+    return CategoryMatcher(categories)
+
+
+@functools.lru_cache(maxsize=8)
+def get_category_matcher(frozen_categories):
+    # The frozen snapshot changes only when categories.json is edited, so the
+    # matcher, its token index and its per-key results are reused until then.
+    return build_category_matcher(frozen_categories)
+
+
+def categorise_transaction(df, categories, min_similarity=None):
+    """Set df["CATEGORY"] from the keywords in categories (a categories.json mapping).
+
+    categories may also be an already built CategoryMatcher, e.g. from a
+    CategoryStore. Pass min_similarity (0-1) to also accept the closest keyword
+    by token overlap. CATEGORY is a categorical of every category in the
+    snapshot, so it takes a byte per row and any of them can be assigned.
+    """
+    import pandas as pd
+
+    if isinstance(categories, CategoryMatcher):
+        matcher = categories
+    else:
+        matcher = get_category_matcher(freeze_categories(categories))
+    with metrics.stage("categorise", rows=len(df)) as fields:
+        particulars = df["PARTICULARS"].astype(str)
+
+        matched = particulars.map(matcher.exact).astype(object)
+        unmatched = matched.isna()
+        if unmatched.any():
+            # Reference numbers make almost every PARTICULARS unique; their merchant
+            # keys are few, so each key is matched once.
+            keys = merchant_keys(particulars[unmatched])
+            categories_by_key = {key: matcher.match_key(key, min_similarity) for key in keys.unique()}
+            matched[unmatched] = keys.map(categories_by_key)
+            fields["keys"] = len(categories_by_key)
+
+        df["CATEGORY"] = matched.fillna("Uncategorised").astype(pd.CategoricalDtype(matcher.names))
+    return df
+
+
+def category_changes(old, new):
+    """Where two aligned CATEGORY columns differ, also when their categories do (e.g. across versions)."""
+    if old.dtype != new.dtype:
+        old, new = old.astype(object), new.astype(object)
+    return old.ne(new)
+
+
+def plain_index(index):
+    """index with categorical levels as plain labels, so rollups of differently categorised frames align."""
+    import pandas as pd
+
+    if isinstance(index, pd.MultiIndex):
+        return index.set_levels([level.astype(object) if isinstance(level, pd.CategoricalIndex) else level
+                                 for level in index.levels])
+    return index.astype(object) if isinstance(index, pd.CategoricalIndex) else index
+
+
+def assign_categories(column, values):
+    """A copy of the CATEGORY column with values (keyed by its labels) written in.
+
+    Categories it does not have yet, such as one added since it was
+    categorised, are added first.
+    """
+    import pandas as pd
+
+    column = column.copy()
+    if isinstance(column.dtype, pd.CategoricalDtype):
+        missing = pd.Index(values.unique()).difference(column.cat.categories)
+        if len(missing):
+            column = column.cat.add_categories(missing)
+    column.loc[values.index] = values
+    return column
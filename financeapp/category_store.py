@@ -0,0 +1,157 @@
+"""categories.json shared safely between sessions and processes.
+
+One CategoryStore per process serves every session. Reading costs a stat() of
+the file; when another process has replaced it, it is parsed again and the
+version goes up. Changes take an advisory lock, re-read the file, apply the
+edit and atomically replace it, so concurrent edits merge instead of the last
+writer clobbering the others.
+"""
+import contextlib
+import json
+import os
+import threading
+
+from .categorise import build_category_matcher, compact_keywords, freeze_categories, learned_keyword
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+    import msvcrt
+
+DEFAULT_CATEGORIES = {"Uncategorised": []}
+
+
+@contextlib.contextmanager
+def file_lock(path):
+    """Exclusive advisory lock on path, held across processes for the with block."""
+    with open(path, "a+b") as f:
+        if fcntl is not None:
+            fcntl.flock(f, fcntl.LOCK_EX)
+        else:
+            f.seek(0)
+            msvcrt.locking(f.fileno(), msvcrt.LK_LOCK, 1)
+        try:
+            yield
+        finally:
+            if fcntl is not None:
+                fcntl.flock(f, fcntl.LOCK_UN)
+            else:
+                f.seek(0)
+                msvcrt.locking(f.fileno(), msvcrt.LK_UNLCK, 1)
+
+
+class CategoryStore:
+    """Process-wide view of a categories.json file with a version number.
+
+    categories() returns a mapping that is never modified in place, so it can be
+    shared by every session; make changes with update(), add_category() or
+    add_keywords(). version changes whenever the categories do, and matcher()
+    only rebuilds the compiled CategoryMatcher then.
+    """
+
+    def __init__(self, path="categories.json"):
+        self.path = path
+        self.lock_path = f"{path}.lock"
+        self.version = 0
+        self._categories = dict(DEFAULT_CATEGORIES)
+        self._stamp = None
+        self._matcher = (None, None)
+        self._lock = threading.RLock()
+        self.refresh()
+
+    def _file_stamp(self):
+        try:
+            stat = os.stat(self.path)
+        except FileNotFoundError:
+            return None
+        # os.replace gives the file a new inode, so writes are seen even within one mtime tick.
+        return (stat.st_mtime_ns, stat.st_size, stat.st_ino)
+
+    def _load(self):
+        stamp = self._file_stamp()
+        if stamp == self._stamp:
+            return
+        categories = DEFAULT_CATEGORIES
+        if stamp is not None:
+            with open(self.path) as f:
+                categories = json.load(f)
+        # Raw PARTICULARS learned by older versions collapse to merchant keys; the
+        # compact form is written back with the next change.
+        self._categories = compact_keywords(categories)
+        self._stamp = stamp
+        self.version += 1
+
+    def refresh(self):
+        """Pick up changes made by other processes; returns the current version."""
+        if self._file_stamp() != self._stamp:
+            with self._lock:
+                self._load()
+        return self.version
+
+    def categories(self):
+        self.refresh()
+        return self._categories
+
+    def matcher(self):
+        """The CategoryMatcher for the current categories, built once per version."""
+        categories = self.categories()
+        with self._lock:
+            version, matcher = self._matcher
+            if version != self.version:
+                matcher = build_category_matcher(freeze_categories(categories))
+                self._matcher = (self.version, matcher)
+            return matcher
+
+    def update(self, change):
+        """Apply change(categories) to a fresh copy under the file lock and save it.
+
+        change edits the dict it is given in place; its return value is returned.
+        The file is only rewritten if the categories actually changed.
+        """
+        with self._lock, file_lock(self.lock_path):
+            # Re-read under the lock so edits saved by other processes are kept.
+            self._load()
+            categories = {category: list(keywords) for category, keywords in self._categories.items()}
+            result = change(categories)
+            if categories != self._categories:
+                tmp_path = f"{self.path}.{os.getpid()}.tmp"
+                with open(tmp_path, "w") as f:
+                    json.dump(categories, f)
+                os.replace(tmp_path, self.path)
+                self._categories = categories
+                self._stamp = self._file_stamp()
+                self.version += 1
+            return result
+
+    def add_category(self, name):
+        """Add an empty category; returns False if it already exists."""
+        def change(categories):
+            if name in categories:
+                return False
+            categories[name] = []
+            return True
+        return self.update(change)
+
+    def add_keywords(self, pairs):
+        """Add (category, PARTICULARS or keyword) pairs as merchant keys; returns how many were added.
+
+        A key moves out of any other category it was listed under, so the latest
+        edit wins for every later payment to that merchant. PARTICULARS without a
+        usable merchant key are stored as they are and only match exactly.
+        """
+        def change(categories):
+            owner = {keyword: category for category, keywords in categories.items() for keyword in keywords}
+            added = 0
+            for category, keyword in pairs:
+                key = learned_keyword(keyword)
+                if not key or owner.get(key) == category:
+                    continue
+                if key in owner:
+                    categories[owner[key]].remove(key)
+                categories.setdefault(category, []).append(key)
+                owner[key] = category
+                added += 1
+            return added
+        # pairs may be a one-shot iterator; update() runs change exactly once.
+        return self.update(change)
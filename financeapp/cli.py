@@ -0,0 +1,128 @@
+"""Headless batch categorisation of a directory of statements.
+
+    python -m financeapp batch statements/ --out categorised/ --categories categories.json
+"""
+import argparse
+import json
+import os
+import sys
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import pandas as pd
+
+from . import transaction_store
+from .aggregates import TransactionAggregates
+from .categorise import categorise_transaction
+from .ingest import file_type, load_statement
+
+STATEMENT_TYPES = ("csv", "pdf")
+OUTPUT_FORMATS = ("parquet", "csv")
+
+
+def find_statements(input_dir):
+    return sorted(
+        os.path.join(input_dir, name) for name in os.listdir(input_dir)
+        if file_type(name) in STATEMENT_TYPES and os.path.isfile(os.path.join(input_dir, name))
+    )
+
+
+def process_statement(path, out_dir, categories, output_format="parquet", store=False, min_similarity=None):
+    """Categorise one statement, write it to out_dir and return (summary row, category totals)."""
+    # Workers are already one process per file, so PDFs are read in-process.
+    df = categorise_transaction(load_statement(path, parallel_pdf=False), categories, min_similarity)
+    name = os.path.basename(path)
+
+    # The source extension stays in the name, so statement.csv and statement.pdf
+    # get separate outputs and a CSV written next to its input never replaces it.
+    out_path = os.path.join(out_dir, f"{name}.{output_format}")
+    if output_format == "parquet":
+        df.to_parquet(out_path, index=False)
+    else:
+        df.to_csv(out_path, index=False, date_format="%d-%m-%Y")
+    if store:
+        transaction_store.append_transactions(df)
+
+    aggregates = TransactionAggregates(df)
+    dates = df["DATE"].dropna()
+    balances = df["BALANCE"].dropna()
+    summary = {
+        "file": name,
+        "output": out_path,
+        "rows": len(df),
+        "first_date": dates.min().date().isoformat() if not dates.empty else None,
+        "last_date": dates.max().date().isoformat() if not dates.empty else None,
+        "total_deposits": round(aggregates.total_deposits, 2),
+        "total_withdrawals": round(float(df["WITHDRAWALS"].sum()), 2),
+        "closing_balance": float(balances.iloc[-1]) if not balances.empty else None,
+        "uncategorised_rows": int((df["CATEGORY"] == "Uncategorised").sum()),
+        "coercion_failures": sum(df.attrs.get("coercion_failures", {}).values()),
+    }
+    totals = aggregates.category_totals()
+    totals.insert(0, "file", name)
+    return summary, totals
+
+
+def run_batch(input_dir, out_dir, categories, output_format="parquet", workers=None, store=False,
+              min_similarity=None):
+    """Process every CSV/PDF statement in input_dir in a process pool.
+
+    Writes one categorised file per statement plus summary.csv and
+    category_totals.csv to out_dir. Returns (summaries, errors) where errors maps
+    file names to messages.
+    """
+    os.makedirs(out_dir, exist_ok=True)
+    paths = find_statements(input_dir)
+    summaries, totals, errors = [], [], {}
+
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        futures = {
+            pool.submit(process_statement, path, out_dir, categories, output_format, store, min_similarity): path
+            for path in paths
+        }
+        for future in as_completed(futures):
+            name = os.path.basename(futures[future])
+            try:
+                summary, category_totals = future.result()
+            except Exception as e:
+                errors[name] = str(e)
+                print(f"{name}: failed: {e}", file=sys.stderr)
+                continue
+            summaries.append(summary)
+            totals.append(category_totals)
+            print(f"{name}: {summary['rows']} rows -> {summary['output']}")
+
+    summaries.sort(key=lambda summary: summary["file"])
+    pd.DataFrame(summaries).to_csv(os.path.join(out_dir, "summary.csv"), index=False)
+    if totals:
+        pd.concat(totals, ignore_index=True).sort_values(["file", "WITHDRAWALS"], ascending=[True, False]) \
+            .to_csv(os.path.join(out_dir, "category_totals.csv"), index=False)
+    if errors:
+        with open(os.path.join(out_dir, "errors.json"), "w") as f:
+            json.dump(errors, f, indent=2)
+    return summaries, errors
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m financeapp", description="Finance App batch tools.")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    batch = commands.add_parser("batch", help="categorise every CSV/PDF statement in a directory")
+    batch.add_argument("input_dir")
+    batch.add_argument("--out", required=True, help="directory for categorised files and reports")
+    batch.add_argument("--categories", default="categories.json", help="categories.json to categorise with")
+    batch.add_argument("--format", choices=OUTPUT_FORMATS, default="parquet")
+    batch.add_argument("--workers", type=int, default=None, help="worker processes (default: CPU count)")
+    batch.add_argument("--store", action="store_true", help="also append the transactions to data/transactions")
+    batch.add_argument("--min-similarity", type=float, default=None,
+                       help="also match the closest keyword by token overlap (0-1, e.g. 0.6)")
+    args = parser.parse_args(argv)
+
+    categories = {"Uncategorised": []}
+    if os.path.exists(args.categories):
+        with open(args.categories) as f:
+            categories = json.load(f)
+
+    summaries, errors = run_batch(args.input_dir, args.out, categories, args.format, args.workers, args.store,
+                                  args.min_similarity)
+    print(f"Processed {len(summaries)} statements, {len(errors)} failed.")
+    return 1 if errors else 0
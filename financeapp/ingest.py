@@ -0,0 +1,224 @@
+import hashlib
+import logging
+import os
+
+import pandas as pd
+
+from . import metrics, pdf_tables, pdf_text, transaction_store
+from .aggregates import StatementSummary
+from .categorise import categorise_transaction
+
+REQUIRED_COLUMNS = ["DATE", "PARTICULARS", "DEPOSITS", "WITHDRAWALS", "BALANCE"]
+NUMERIC_COLUMNS = ["DEPOSITS", "WITHDRAWALS", "BALANCE"]
+CSV_CHUNK_ROWS = 50_000
+DATE_FORMATS = ["%d-%b-%Y", "%d-%m-%Y", "%d/%m/%Y", "%d-%b-%y", "%d-%m-%y", "%d/%m/%y", "%Y-%m-%d", "%d %b %Y"]
+
+logger = logging.getLogger(__name__)
+
+
+class StatementError(ValueError):
+    """Raised when a file cannot be read as a bank statement."""
+
+
+def hash_bytes(data):
+    return hashlib.sha256(data).hexdigest()
+
+
+def file_type(name):
+    return str(name).rsplit(".", 1)[-1].lower()
+
+
+def sniff_date_format(dates, sample_size=50):
+    """Pick the known format that parses most of a small sample, ignoring a few bad cells."""
+    sample = dates.dropna().astype(str).str.strip().head(sample_size)
+    if sample.empty:
+        return None
+    best_format, best_count = None, 0
+    for date_format in DATE_FORMATS:
+        count = pd.to_datetime(sample, format=date_format, errors="coerce").notna().sum()
+        if count > best_count:
+            best_format, best_count = date_format, count
+    return best_format if best_count >= 0.8 * len(sample) else None
+
+
+def check_columns(df):
+    """Strip the column names in place and raise StatementError if a required one is missing."""
+    df.columns = [str(col).strip() for col in df.columns]
+    missing_columns = [col for col in REQUIRED_COLUMNS if col not in df.columns]
+    if missing_columns:
+        raise StatementError(
+            f"The following required columns are missing from the file: {', '.join(missing_columns)}. "
+            f"Available columns: {', '.join(df.columns)}"
+        )
+
+
+@metrics.timed("normalise")
+def normalise_transactions(df, date_format=None):
+    """Coerce the statement columns to their final dtypes in one pass.
+
+    Values that could not be converted become NaN/NaT; how many per column is
+    recorded in df.attrs["coercion_failures"] along with the offending rows.
+    Pass date_format to skip sniffing, e.g. for every chunk after the first.
+    """
+    df = df[REQUIRED_COLUMNS].copy()
+    failed = pd.Series(False, index=df.index)
+    failures = {}
+
+    for col in NUMERIC_COLUMNS:
+        values = df[col]
+        # Columns the CSV parser already read as numbers need no further work.
+        if values.dtype == object:
+            text = values.astype(str).str.replace(",", "", regex=False).str.strip()
+            values = pd.to_numeric(text, errors="coerce")
+            bad = values.isna() & df[col].notna() & (text != "")
+            if bad.any():
+                failures[col] = int(bad.sum())
+                failed |= bad
+        df[col] = values.astype("float64")
+
+    dates = df["DATE"]
+    if not pd.api.types.is_datetime64_any_dtype(dates):
+        date_format = date_format or sniff_date_format(dates)
+        if date_format is not None:
+            parsed = pd.to_datetime(dates, format=date_format, errors="coerce")
+        else:
+            parsed = pd.to_datetime(dates, errors="coerce", dayfirst=True)
+        bad = parsed.isna() & dates.notna()
+        if bad.any():
+            failures["DATE"] = int(bad.sum())
+            failed |= bad
+        df["DATE"] = parsed
+
+    # Stable sort keeps same-day transactions in statement order.
+    df = df.sort_values(by=["DATE"], kind="stable")
+    df.attrs["coercion_failures"] = failures
+    df.attrs["failed_rows"] = df.loc[failed.reindex(df.index)].index.tolist()
+    return df
+
+
+@metrics.timed("read_csv")
+def read_csv_statement(file, **kwargs):
+    # Amounts like "17,569.11" are parsed as numbers by the C parser.
+    return pd.read_csv(file, dtype={"DATE": str, "PARTICULARS": str}, thousands=",", **kwargs)
+
+
+@metrics.timed("read_pdf")
+def read_pdf_statement(pdf_bytes, password=None, parallel=True):
+    """Extract the raw transaction table from a PDF, going through the on-disk table cache.
+
+    Pages are read from the PDF's text layer where that parses cleanly; only
+    the remaining pages (all of them without pdfminer.six) are sent to tabula.
+    Raises pdf_tables.PdfPasswordError when the PDF needs a (different) password.
+    The tables of a password-protected PDF are only cached, and only served from
+    the cache, when pdfminer.six can check the password first.
+    """
+    file_hash = hash_bytes(pdf_bytes)
+    encrypted = pdf_tables.is_encrypted(pdf_bytes)
+    cacheable = True
+    if encrypted:
+        opens = pdf_text.opens_with(pdf_bytes, password)
+        if opens is False:
+            raise pdf_tables.PdfPasswordError("The PDF password is incorrect")
+        cacheable = opens is True
+
+    # A statement we have already extracted never needs the JVM again.
+    df = pdf_tables.load_cached_tables(file_hash, encrypted) if cacheable else None
+    if df is not None:
+        return df
+
+    tables, fallback_pages, fallback_at = [], None, 0
+    pages = pdf_text.iter_statement_pages(pdf_bytes, password)
+    if pages is not None:
+        fallback_pages = []
+        with metrics.stage("pdf_text") as fields:
+            for number, rows in pages:
+                if rows is None:
+                    if not fallback_pages:
+                        fallback_at = len(tables)
+                    fallback_pages.append(number)
+                elif rows:
+                    tables.append(pd.DataFrame(rows, columns=pdf_text.COLUMNS))
+            fields.update(tables=len(tables), fallback_pages=len(fallback_pages))
+
+    if fallback_pages is None or fallback_pages:
+        if not pdf_tables.check_java_installed():
+            raise StatementError("Java is required to read PDF files. Please install Java from "
+                                 "https://www.java.com/download/ and restart the application.")
+        # tabula's tables go where its first page was, so rows keep statement order
+        # when the pages it reads are contiguous.
+        with metrics.stage("tabula", pages=len(fallback_pages) if fallback_pages else "all"):
+            tables[fallback_at:fallback_at] = pdf_tables.extract_tables(
+                pdf_bytes, password=password, parallel=parallel, pages=fallback_pages)
+    if not tables:
+        raise StatementError("No tables found in the PDF file.")
+
+    df = pd.concat(tables, ignore_index=True)
+    if not cacheable:
+        return df
+    try:
+        pdf_tables.save_cached_tables(file_hash, encrypted, df)
+    except Exception as e:
+        logger.warning("Could not cache PDF tables: %s", e)
+    return df
+
+
+def _read_bytes(file):
+    if isinstance(file, (str, os.PathLike)):
+        with open(file, "rb") as f:
+            return f.read()
+    if hasattr(file, "getvalue"):
+        return file.getvalue()
+    return file.read()
+
+
+def load_statement(file, name=None, password=None, parallel_pdf=True):
+    """Read and normalise a CSV or PDF statement from a path or a file-like object.
+
+    The file type comes from name, or from the path / the object's name attribute.
+    Raises StatementError for files that are not usable statements.
+    """
+    name = name or getattr(file, "name", file)
+    kind = file_type(name)
+    if kind == "csv":
+        df = read_csv_statement(file)
+    elif kind == "pdf":
+        df = read_pdf_statement(_read_bytes(file), password=password, parallel=parallel_pdf)
+    else:
+        raise StatementError(f"Unsupported file type: {kind}. Please upload a CSV or PDF file.")
+
+    check_columns(df)
+    df = normalise_transactions(df)
+    if df["DATE"].isna().all():
+        raise StatementError("Could not parse any dates in the DATE column.")
+    return df
+
+
+def iter_csv_chunks(file, chunksize=CSV_CHUNK_ROWS):
+    """Yield a CSV statement as normalised chunks of up to chunksize rows, from the start of file."""
+    date_format = None
+    if hasattr(file, "seek"):
+        file.seek(0)
+    for chunk in read_csv_statement(file, chunksize=chunksize):
+        check_columns(chunk)
+        if date_format is None:
+            # Sniffed once from the first chunk and reused for the rest.
+            date_format = sniff_date_format(chunk["DATE"])
+        yield normalise_transactions(chunk, date_format=date_format)
+
+
+def ingest_csv_in_chunks(file, categories, chunksize=CSV_CHUNK_ROWS, on_chunk=None, store=True):
+    """Normalise, categorise and store a CSV chunk by chunk, keeping only running totals.
+
+    The full raw frame is never built: each chunk is appended to the transaction
+    store (unless store is False) and folded into a StatementSummary before the
+    next one is read.
+    """
+    summary = StatementSummary()
+    for chunk in iter_csv_chunks(file, chunksize):
+        chunk = categorise_transaction(chunk, categories)
+        if store:
+            transaction_store.append_transactions(chunk)
+        summary.update(chunk)
+        if on_chunk is not None:
+            on_chunk(summary)
+    return summary
@@ -0,0 +1,156 @@
+"""Timing and memory of the processing stages.
+
+Wrap a stage in ``with stage("categorise", rows=len(df)):`` and one record is
+kept per call: wall and CPU seconds, any fields given, and, while memory
+tracing is on, the peak of Python-tracked allocations (numpy arrays included,
+Arrow buffers not) during the stage. Records go to an in-memory ring buffer
+for the app's performance panel, to any collect() block active in the calling
+context, and as one JSON object per line to the "financeapp.metrics" logger.
+Set FINANCEAPP_METRICS_FILE to also append them to a JSON-lines file.
+
+Stdlib only, so it is cheap to import and to leave on.
+"""
+import collections
+import contextlib
+import contextvars
+import functools
+import json
+import logging
+import os
+import threading
+import time
+import tracemalloc
+
+RECORD_LIMIT = 2000
+METRICS_FILE = os.environ.get("FINANCEAPP_METRICS_FILE")
+
+logger = logging.getLogger(__name__)
+
+_records = collections.deque(maxlen=RECORD_LIMIT)
+_lock = threading.Lock()
+_collector = contextvars.ContextVar("financeapp_metrics_collector", default=None)
+# Open stages of this thread, outermost first, each [peak seen so far, traced bytes at start].
+_open = threading.local()
+_trace_memory = False
+
+
+def trace_memory(enabled=True):
+    """Turn allocation tracing on or off for the whole process.
+
+    Tracing makes every allocation slower, so it is off unless asked for.
+    Stages only measure memory while it is on through here, so they leave the
+    peak of other tracemalloc users (such as the benchmarks) alone.
+    """
+    global _trace_memory
+    _trace_memory = enabled
+    if enabled and not tracemalloc.is_tracing():
+        tracemalloc.start()
+    elif not enabled and tracemalloc.is_tracing():
+        tracemalloc.stop()
+
+
+def _note_peak():
+    # reset_peak() is process-wide, so the peak reached so far is handed to the
+    # enclosing stages before an inner stage resets it.
+    peak = tracemalloc.get_traced_memory()[1]
+    for frame in getattr(_open, "stack", ()):
+        frame[0] = max(frame[0], peak)
+
+
+@contextlib.contextmanager
+def stage(name, **fields):
+    """Record how long the with block takes; yields fields, so counts found inside can be added."""
+    tracing = _trace_memory and tracemalloc.is_tracing()
+    frame = None
+    if tracing:
+        _note_peak()
+        tracemalloc.reset_peak()
+        current = tracemalloc.get_traced_memory()[0]
+        frame = [current, current]
+        _open.__dict__.setdefault("stack", []).append(frame)
+    start, cpu_start = time.perf_counter(), time.thread_time()
+    error = None
+    try:
+        yield fields
+    except BaseException as e:
+        error = type(e).__name__
+        raise
+    finally:
+        record = {
+            "stage": name,
+            "seconds": round(time.perf_counter() - start, 6),
+            "cpu_seconds": round(time.thread_time() - cpu_start, 6),
+            **fields,
+        }
+        if frame is not None:
+            _note_peak()
+            _open.stack.remove(frame)
+            record["peak_bytes"] = max(frame[0] - frame[1], 0)
+        if error is not None:
+            record["error"] = error
+        record["time"] = round(time.time(), 3)
+        _emit(record)
+
+
+def timed(name):
+    """Decorator recording every call of the function as a stage."""
+    def decorate(function):
+        @functools.wraps(function)
+        def wrapper(*args, **kwargs):
+            with stage(name):
+                return function(*args, **kwargs)
+        return wrapper
+    return decorate
+
+
+def _emit(record):
+    with _lock:
+        _records.append(record)
+    collector = _collector.get()
+    if collector is not None:
+        collector.append(record)
+    if logger.isEnabledFor(logging.INFO) or METRICS_FILE:
+        line = json.dumps(record, default=str)
+        logger.info(line)
+        if METRICS_FILE:
+            with _lock, open(METRICS_FILE, "a") as f:
+                f.write(line + "\n")
+
+
+@contextlib.contextmanager
+def collect():
+    """Gather the records of the stages run in this context (e.g. one app run) into a list."""
+    records = []
+    token = _collector.set(records)
+    try:
+        yield records
+    finally:
+        _collector.reset(token)
+
+
+def recent(limit=None):
+    """The most recent records of the process, oldest first."""
+    with _lock:
+        records = list(_records)
+    return records[-limit:] if limit else records
+
+
+def summary(records=None):
+    """Per-stage call count, total, mean and max seconds (and max peak_bytes if traced)."""
+    stages = {}
+    for record in recent() if records is None else records:
+        row = stages.setdefault(record["stage"], {"stage": record["stage"], "calls": 0,
+                                                  "total_seconds": 0.0, "max_seconds": 0.0})
+        row["calls"] += 1
+        row["total_seconds"] += record["seconds"]
+        row["max_seconds"] = max(row["max_seconds"], record["seconds"])
+        if "peak_bytes" in record:
+            row["max_peak_bytes"] = max(row.get("max_peak_bytes", 0), record["peak_bytes"])
+    for row in stages.values():
+        row["mean_seconds"] = row["total_seconds"] / row["calls"]
+    return sorted(stages.values(), key=lambda row: row["total_seconds"], reverse=True)
+
+
+def to_jsonl(records=None):
+    """Records as JSON lines, for export."""
+    return "".join(json.dumps(record, default=str) + "\n" for record in (recent() if records is None else records))
@@ -0,0 +1,36 @@
+import pandas as pd
+
+PAGE_SIZES = [50, 100, 250, 500]
+
+
+def filter_transactions(df, amount_column, start=None, end=None, categories=None,
+                        min_amount=None, max_amount=None, accounts=None):
+    """Boolean mask of the rows matching the table filters."""
+    mask = pd.Series(True, index=df.index)
+    if start is not None:
+        mask &= df["DATE"] >= pd.Timestamp(start)
+    if end is not None:
+        mask &= df["DATE"] < pd.Timestamp(end) + pd.Timedelta(days=1)
+    if categories:
+        mask &= df["CATEGORY"].isin(categories)
+    if accounts:
+        mask &= df["ACCOUNT"].isin(accounts)
+    if min_amount is not None:
+        mask &= df[amount_column] >= min_amount
+    if max_amount is not None:
+        mask &= df[amount_column] <= max_amount
+    return mask
+
+
+def window_transactions(df, mask, columns, sort_by="DATE", ascending=True, page=1, page_size=PAGE_SIZES[1]):
+    """Sort the rows selected by mask and return one page of them.
+
+    Only the sort key is sorted and only the page's rows are copied. The page
+    keeps df's index labels so edits made on it map back to the right rows.
+    """
+    keys = df.loc[mask, sort_by]
+    # Frames are already in date order, so the default sort needs no work.
+    if sort_by != "DATE" or not ascending:
+        keys = keys.sort_values(ascending=ascending, kind="stable", na_position="last")
+    first = (page - 1) * page_size
+    return df.loc[keys.index[first:first + page_size], columns]
@@ -0,0 +1,236 @@
+import logging
+import os
+import re
+import subprocess
+import sys
+import tempfile
+import threading
+import warnings
+from concurrent.futures import ProcessPoolExecutor, wait
+from concurrent.futures.process import BrokenProcessPool
+from functools import lru_cache
+
+import pandas as pd
+
+PDF_CACHE_DIR = os.path.join(".cache", "pdf_tables")
+PASSWORD_ERRORS = ("password is incorrect", "Cannot decrypt PDF")
+PDF_WORKERS = int(os.environ.get("FINANCEAPP_PDF_WORKERS", min(4, os.cpu_count() or 1)))
+# Documents extracted at once across all sessions; further uploads wait their turn
+# rather than queueing every page range of every PDF on the workers.
+PDF_MAX_DOCUMENTS = int(os.environ.get("FINANCEAPP_PDF_MAX_DOCUMENTS", 2))
+# Heap per worker JVM, so the extraction service is bounded to PDF_WORKERS times this.
+JVM_HEAP = os.environ.get("FINANCEAPP_PDF_JVM_HEAP", "512m")
+JVM_OPTIONS = [f"-Xmx{JVM_HEAP}", "-XX:ReservedCodeCacheSize=256m"]
+# Same switches tabula adds for silent=True; they only take effect at JVM start.
+_SILENT_OPTIONS = [
+    "-Dorg.slf4j.simpleLogger.defaultLogLevel=off",
+    "-Dorg.apache.commons.logging.Log=org.apache.commons.logging.impl.NoOpLog",
+]
+
+logger = logging.getLogger(__name__)
+
+_PAGE_PATTERN = re.compile(rb"/Type\s*/Page(?![a-zA-Z])")
+_executor = None
+_executor_lock = threading.Lock()
+_document_slots = threading.BoundedSemaphore(PDF_MAX_DOCUMENTS)
+
+
+class PdfPasswordError(Exception):
+    """Raised when a PDF cannot be opened with the given password."""
+
+
+@lru_cache(maxsize=None)
+def check_java_installed():
+    """Check if Java is installed on the system and set JAVA_HOME if needed.
+
+    Runs the probe once per process; spawning ``java -version`` on every PDF
+    upload cost a JVM start each time.
+    """
+    try:
+        # Try to get Java version
+        subprocess.check_output(['java', '-version'], stderr=subprocess.STDOUT)
+
+        # If we're on macOS, try to get the Java home path
+        if sys.platform == 'darwin':
+            try:
+                java_home = subprocess.check_output(['/usr/libexec/java_home'], text=True).strip()
+                if java_home and os.path.exists(java_home):
+                    os.environ['JAVA_HOME'] = java_home
+                    return True
+            except Exception:
+                # If /usr/libexec/java_home fails, we'll use the hardcoded path
+                pass
+
+        return True
+    except (subprocess.CalledProcessError, FileNotFoundError):
+        return False
+
+
+def is_password_error(error):
+    return any(message in str(error) for message in PASSWORD_ERRORS)
+
+
+def is_encrypted(pdf_bytes):
+    # The trailer of an encrypted PDF always references an /Encrypt dictionary,
+    # which lets us skip the old page-1 probe through the JVM.
+    return b"/Encrypt" in pdf_bytes
+
+
+def count_pages(pdf_bytes):
+    """Count page objects without parsing the PDF; returns 0 if they are hidden in object streams."""
+    return len(_PAGE_PATTERN.findall(pdf_bytes))
+
+
+def cache_path(file_hash, encrypted):
+    suffix = "protected" if encrypted else "open"
+    return os.path.join(PDF_CACHE_DIR, f"{file_hash}-{suffix}.parquet")
+
+
+def load_cached_tables(file_hash, encrypted):
+    path = cache_path(file_hash, encrypted)
+    if not os.path.exists(path):
+        return None
+    try:
+        return pd.read_parquet(path)
+    except Exception:
+        # A partially written or corrupt entry is simply extracted again.
+        return None
+
+
+def save_cached_tables(file_hash, encrypted, df):
+    os.makedirs(PDF_CACHE_DIR, exist_ok=True)
+    df = df.copy()
+    df.columns = [str(col) for col in df.columns]
+    # tabula returns columns mixing numbers and strings, which Parquet cannot store;
+    # everything is kept as text (nulls preserved) and cleaned by the normal pipeline.
+    for col in df.columns:
+        df[col] = df[col].where(df[col].isna(), df[col].astype(str))
+    path = cache_path(file_hash, encrypted)
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    df.to_parquet(tmp_path, index=False)
+    os.replace(tmp_path, path)
+
+
+@lru_cache(maxsize=None)
+def start_jvm():
+    """Start tabula's JVM in this process through JPype, once.
+
+    tabula keeps a JPype JVM for the life of the process, so every later
+    read_pdf call here is a method call rather than a JVM launch. Without JPype
+    tabula falls back to one ``java`` subprocess per call. Returns whether an
+    in-process JVM is running.
+    """
+    try:
+        import jpype
+        from tabula.backend import jar_path
+
+        if not jpype.isJVMStarted():
+            jpype.addClassPath(jar_path())
+            jpype.startJVM(*JVM_OPTIONS, *_SILENT_OPTIONS, convertStrings=False)
+        # Loading the extractor classes now keeps class loading off the first request.
+        jpype.JClass("technology.tabula.CommandLineApp")
+    except Exception as e:
+        # Never fail a pool initializer; read_pdf reports the real error per call.
+        logger.warning("Could not start an in-process JVM for tabula, using a java subprocess per call: %s", e)
+        return False
+    return True
+
+
+def get_executor():
+    """Return the process pool that keeps tabula (and its JVM) off the Streamlit thread.
+
+    The workers are long-lived and each starts its JVM as it comes up, so they
+    stay warm between uploads from any session.
+    """
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ProcessPoolExecutor(max_workers=PDF_WORKERS, initializer=start_jvm)
+        return _executor
+
+
+def _discard_executor(executor):
+    """Drop a pool whose worker died (e.g. a JVM out of memory) so the next call starts afresh."""
+    global _executor
+    with _executor_lock:
+        if _executor is executor:
+            _executor = None
+    executor.shutdown(wait=False)
+
+
+def _extract_pages(pdf_path, pages, password):
+    import tabula
+    # Suppress font warnings
+    warnings.filterwarnings('ignore', message='.*font.*')
+    # java_options only matter for the subprocess fallback; a running JVM ignores them.
+    java_options = None if start_jvm() else JVM_OPTIONS
+    try:
+        return tabula.read_pdf(pdf_path, pages=pages, multiple_tables=True, stream=True,
+                               password=password, lattice=True, silent=True, guess=False,
+                               java_options=java_options)
+    except Exception as e:
+        # Java exceptions raised through JPype do not pickle back to the parent process.
+        raise RuntimeError(str(e)) from None
+
+
+def split_pages(pages, chunks):
+    """Split a list of page numbers into at most chunks contiguous runs; ["all"] if it is empty."""
+    if not pages:
+        return ["all"]
+    chunks = max(1, min(chunks, len(pages)))
+    size = -(-len(pages) // chunks)
+    return [pages[start:start + size] for start in range(0, len(pages), size)]
+
+
+def extract_tables(pdf_bytes, password=None, parallel=True, pages=None):
+    """Extract all tables from a PDF, reading page ranges in parallel worker processes.
+
+    pages limits extraction to those page numbers. With parallel=False the
+    document is read in the calling process, for callers that are already pool
+    workers themselves.
+    """
+    if not parallel:
+        start_jvm()
+        with tempfile.NamedTemporaryFile(suffix=".pdf", delete=False) as tmp:
+            tmp.write(pdf_bytes)
+        try:
+            return _extract_pages(tmp.name, pages or "all", password)
+        except RuntimeError as e:
+            if is_password_error(e):
+                raise PdfPasswordError(str(e)) from None
+            raise
+        finally:
+            os.remove(tmp.name)
+
+    if pages is None:
+        pages = list(range(1, count_pages(pdf_bytes) + 1))
+    page_ranges = split_pages(pages, PDF_WORKERS)
+
+    with tempfile.NamedTemporaryFile(suffix=".pdf", delete=False) as tmp:
+        tmp.write(pdf_bytes)
+        pdf_path = tmp.name
+    futures = []
+    try:
+        with _document_slots:
+            executor = get_executor()
+            try:
+                futures = [executor.submit(_extract_pages, pdf_path, pages, password) for pages in page_ranges]
+                tables = []
+                # Collect in submission order so rows keep their page order.
+                for future in futures:
+                    try:
+                        tables.extend(future.result())
+                    except RuntimeError as e:
+                        if is_password_error(e):
+                            raise PdfPasswordError(str(e)) from None
+                        raise
+                return tables
+            except BrokenProcessPool:
+                _discard_executor(executor)
+                raise RuntimeError("A PDF worker process exited while reading the statement; "
+                                   f"it may need more than {JVM_HEAP} of Java heap.") from None
+            finally:
+                # Workers may still be reading the file if another page range failed.
+                wait(futures)
+    finally:
+        os.remove(pdf_path)
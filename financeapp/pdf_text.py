@@ -0,0 +1,269 @@
+"""Read statement rows straight from a PDF's text layer, without Java.
+
+Most bank statements are generated PDFs whose text already carries the table:
+the column headers give the x-ranges of the columns and every transaction
+starts on a line with a date. Pages are parsed one at a time; a page that does
+not parse cleanly (unknown layout, stray amounts, broken balance continuity)
+is reported as None so the caller can hand just that page to tabula.
+
+Needs the optional pdfminer.six package (pure Python); without it
+iter_statement_pages() returns None and every page goes through tabula.
+"""
+import io
+import logging
+import re
+import statistics
+
+from .pdf_tables import PdfPasswordError
+
+COLUMNS = ["DATE", "PARTICULARS", "DEPOSITS", "WITHDRAWALS", "BALANCE"]
+AMOUNT_COLUMNS = ["DEPOSITS", "WITHDRAWALS", "BALANCE"]
+
+logger = logging.getLogger(__name__)
+
+_DATE_PATTERN = re.compile(r"^(\d{1,2}[-/.]\d{1,2}[-/.]\d{2,4}|\d{1,2}[- ][A-Za-z]{3}[- ]\d{2,4}|\d{4}-\d{2}-\d{2})$")
+_AMOUNT_PATTERN = re.compile(r"^\d{1,3}(,?\d{2,3})*\.\d{2}(\s?Cr)?$")
+# Lines closer than this many text heights belong to the same transaction cell.
+_CELL_HEIGHTS = 2.5
+_LINE_TOLERANCE = 2
+# Characters further apart than this (in points) start a new word.
+_WORD_GAP = 3
+
+
+def _amount_text(text):
+    """An amount cell as the number text tabula would give, without the "Cr" of a credit balance."""
+    text = text.replace(" ", "")
+    return text[:-2] if text.endswith("Cr") else text
+
+
+def _amount(text):
+    return float(_amount_text(text).replace(",", ""))
+
+
+def _group_lines(items, key="top"):
+    """Group characters or words whose tops are within _LINE_TOLERANCE into lines, top to bottom."""
+    lines = []
+    for item in sorted(items, key=lambda item: (item[key], item["x0"])):
+        if lines and abs(item[key] - lines[-1][0][key]) <= _LINE_TOLERANCE:
+            lines[-1].append(item)
+        else:
+            lines.append([item])
+    return [sorted(line, key=lambda item: item["x0"]) for line in lines]
+
+
+def _page_chars(items, page_height):
+    """Flatten pdfminer's layout objects into character dicts with top-down coordinates."""
+    from pdfminer.layout import LTChar, LTContainer
+
+    chars = []
+    for item in items:
+        if isinstance(item, LTChar):
+            chars.append({"text": item.get_text(), "x0": item.x0, "x1": item.x1,
+                          "top": page_height - item.y1, "bottom": page_height - item.y0})
+        elif isinstance(item, LTContainer):
+            chars.extend(_page_chars(item, page_height))
+    return chars
+
+
+def _words(chars):
+    """Join the characters of each line into words, splitting at spaces and gaps."""
+    words = []
+    for line in _group_lines(chars):
+        current = None
+        for char in line:
+            if char["text"].isspace():
+                current = None
+                continue
+            if current is not None and char["x0"] - current["x1"] <= _WORD_GAP:
+                current["text"] += char["text"]
+                current["x1"] = char["x1"]
+                current["bottom"] = max(current["bottom"], char["bottom"])
+            else:
+                current = dict(char)
+                words.append(current)
+    return words
+
+
+def find_layout(chars):
+    """Return (header bottom, column boundaries) from the page's header row, or None.
+
+    Header words are matched on their characters with spacing removed, since
+    generated statements often kern words apart ("WITHDRA WALS"). A column owns
+    everything up to halfway to the next header's centre.
+    """
+    for line in _group_lines(chars):
+        chars = [char for char in line if not char["text"].isspace()]
+        text = "".join(char["text"] for char in chars).upper()
+        spans, position = [], 0
+        for column in COLUMNS:
+            start = text.find(column, position)
+            if start < 0:
+                break
+            end = start + len(column)
+            spans.append((chars[start]["x0"], chars[end - 1]["x1"]))
+            position = end
+        if len(spans) < len(COLUMNS):
+            continue
+        centres = [(x0 + x1) / 2 for x0, x1 in spans]
+        boundaries = [(left + right) / 2 for left, right in zip(centres, centres[1:])]
+        return max(char["bottom"] for char in line), boundaries
+    return None
+
+
+def _split_columns(words, boundaries):
+    cells = {column: [] for column in COLUMNS}
+    for word in words:
+        centre = (word["x0"] + word["x1"]) / 2
+        index = sum(centre > boundary for boundary in boundaries)
+        cells[COLUMNS[index]].append(word["text"])
+    return {column: " ".join(texts) for column, texts in cells.items()}
+
+
+def _balances_continue(rows, previous_balance):
+    """Whether each balance follows from the one before it, in either statement order.
+
+    previous_balance, the last balance of the page before, is only checked for
+    oldest-first statements.
+    """
+    balances = [_amount(row["BALANCE"]) for row in rows]
+    changes = [_amount(row["DEPOSITS"] or "0") - _amount(row["WITHDRAWALS"] or "0") for row in rows]
+    pairs = range(1, len(balances))
+    backward = all(abs(balances[i] + changes[i - 1] - balances[i - 1]) < 0.005 for i in pairs)
+    if previous_balance is not None:
+        balances.insert(0, previous_balance)
+        changes.insert(0, None)
+        pairs = range(1, len(balances))
+    forward = all(abs(balances[i - 1] + changes[i] - balances[i]) < 0.005 for i in pairs)
+    return forward or backward
+
+
+def parse_page(words, layout, previous_balance=None):
+    """Parse one page into rows of COLUMNS text, or return None if it cannot be parsed confidently.
+
+    Lines without a date are PARTICULARS continuations of the nearest
+    transaction line and are joined with "\\r", as tabula joins the lines of a
+    cell. Text outside the table (page headers, footers) is skipped.
+    """
+    header_bottom, boundaries = layout
+    words = [word for word in words if word["top"] > header_bottom]
+    if not words:
+        return []
+    height = statistics.median(word["bottom"] - word["top"] for word in words)
+
+    entries, continuations = [], []
+    for line in _group_lines(words):
+        cells = _split_columns(line, boundaries)
+        top = line[0]["top"]
+        if _DATE_PATTERN.match(cells["DATE"]):
+            if not all(not cells[col] or _AMOUNT_PATTERN.match(cells[col]) for col in AMOUNT_COLUMNS):
+                return None
+            if not cells["BALANCE"] or bool(cells["DEPOSITS"]) == bool(cells["WITHDRAWALS"]):
+                return None
+            entries.append((top, cells, [(top, cells["PARTICULARS"])]))
+        elif any(_AMOUNT_PATTERN.match(cells[col]) for col in AMOUNT_COLUMNS):
+            # Amounts without a date: an opening balance, a total or a row we misread.
+            return None
+        elif cells["PARTICULARS"] and not (cells["DATE"] or any(cells[col] for col in AMOUNT_COLUMNS)):
+            continuations.append((top, cells["PARTICULARS"]))
+
+    if not entries:
+        return []
+    tops = [top for top, _, _ in entries]
+    for top, text in continuations:
+        # Ties go to the earlier transaction.
+        nearest = min(range(len(entries)), key=lambda i: (abs(tops[i] - top), i))
+        if abs(tops[nearest] - top) <= _CELL_HEIGHTS * height:
+            entries[nearest][2].append((top, text))
+
+    rows = []
+    for _, cells, parts in entries:
+        cells["PARTICULARS"] = "\r".join(text for _, text in sorted(parts) if text)
+        for column in AMOUNT_COLUMNS:
+            cells[column] = _amount_text(cells[column])
+        rows.append({column: cells[column] or None for column in COLUMNS})
+    if not _balances_continue(rows, previous_balance):
+        return None
+    return rows
+
+
+def opens_with(pdf_bytes, password=None):
+    """Whether password opens the PDF: True or False, or None when pdfminer.six cannot tell.
+
+    Only parses the trailer and checks the password against the encryption
+    dictionary; no page is read.
+    """
+    try:
+        from pdfminer.pdfdocument import PDFDocument, PDFPasswordIncorrect
+        from pdfminer.pdfparser import PDFParser
+    except ImportError:
+        return None
+    try:
+        PDFDocument(PDFParser(io.BytesIO(pdf_bytes)), password=password or "")
+    except PDFPasswordIncorrect:
+        return False
+    except Exception:
+        return None
+    return True
+
+
+def iter_statement_pages(pdf_bytes, password=None):
+    """Yield (page number, rows or None) for each page of a PDF statement, lazily.
+
+    Returns None when pdfminer.six is not installed or cannot open the document,
+    and a page pdfminer fails on is yielded as None, so tabula gets another go at
+    it. Raises PdfPasswordError when the PDF cannot be opened with the given
+    password.
+    """
+    try:
+        from pdfminer.converter import PDFPageAggregator
+        from pdfminer.pdfdocument import PDFDocument, PDFPasswordIncorrect
+        from pdfminer.pdfinterp import PDFPageInterpreter, PDFResourceManager
+        from pdfminer.pdfpage import PDFPage
+        from pdfminer.pdfparser import PDFParser
+    except ImportError:
+        return None
+
+    try:
+        document = PDFDocument(PDFParser(io.BytesIO(pdf_bytes)), password=password or "")
+        # Walking the page tree up front means a broken one falls back as a whole
+        # instead of silently ending the statement early.
+        pdf_pages = list(PDFPage.create_pages(document))
+    except PDFPasswordIncorrect:
+        raise PdfPasswordError("The PDF password is incorrect") from None
+    except Exception as e:
+        logger.info("pdfminer could not open the PDF, using tabula for every page: %r", e)
+        return None
+    if not pdf_pages:
+        return None
+
+    def pages():
+        resources = PDFResourceManager()
+        # No layout analysis: the columns come from the header, not from pdfminer.
+        device = PDFPageAggregator(resources, laparams=None)
+        interpreter = PDFPageInterpreter(resources, device)
+        layout, previous_balance = None, None
+        for number, page in enumerate(pdf_pages, start=1):
+            try:
+                interpreter.process_page(page)
+                result = device.get_result()
+                chars = _page_chars(result, result.height)
+            except Exception as e:
+                logger.info("pdfminer could not read page %d, using tabula for it: %r", number, e)
+                previous_balance = None
+                yield number, None
+                continue
+            # Pages without their own header reuse the columns of the last one seen.
+            page_layout = find_layout(chars)
+            if page_layout is not None:
+                layout = page_layout
+            elif layout is not None:
+                page_layout = (0, layout[1])
+            rows = parse_page(_words(chars), page_layout, previous_balance) if page_layout else None
+            # Only a page we parsed ourselves tells us where the balance stands.
+            if rows:
+                previous_balance = _amount(rows[-1]["BALANCE"])
+            elif rows is None:
+                previous_balance = None
+            yield number, rows
+
+    return pages()
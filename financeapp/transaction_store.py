@@ -0,0 +1,137 @@
+import glob
+import os
+import threading
+import uuid
+
+from . import metrics
+from .category_store import file_lock
+
+STORE_DIR = os.path.join("data", "transactions")
+KEY_COLUMNS = ["DATE", "PARTICULARS", "DEPOSITS", "WITHDRAWALS", "BALANCE"]
+
+_write_lock = threading.Lock()
+
+
+def _partition_dir(month):
+    return os.path.join(STORE_DIR, f"month={month}")
+
+
+def _lock_path(month):
+    # Dot-prefixed, so neither the month=* glob nor the Parquet dataset sees it.
+    return os.path.join(STORE_DIR, f".month={month}.lock")
+
+
+def _part_files(month=None):
+    pattern = _partition_dir(month) if month else os.path.join(STORE_DIR, "month=*")
+    return sorted(glob.glob(os.path.join(pattern, "*.parquet")))
+
+
+def store_version():
+    """Cheap fingerprint of the store; changes whenever transactions are appended."""
+    files = _part_files()
+    if not files:
+        return (0, 0.0)
+    return (len(files), max(os.path.getmtime(path) for path in files))
+
+
+def month_versions():
+    """store_version() of each month, as {month: (part files, latest mtime)}."""
+    versions = {}
+    for month in list_months():
+        files = _part_files(month)
+        if files:
+            versions[month] = (len(files), max(os.path.getmtime(path) for path in files))
+    return versions
+
+
+def list_months():
+    return sorted(os.path.basename(path).split("=", 1)[1]
+                  for path in glob.glob(os.path.join(STORE_DIR, "month=*")))
+
+
+def _read_partition_keys(month):
+    import pandas as pd
+
+    files = _part_files(month)
+    if not files:
+        return None
+    return pd.concat((pd.read_parquet(path, columns=KEY_COLUMNS) for path in files), ignore_index=True)
+
+
+@metrics.timed("history_append")
+def append_transactions(df):
+    """Append normalised transactions to the store, skipping rows it already holds.
+
+    Each month is a Hive-style partition; new rows are written as a fresh part
+    file so existing files are never rewritten. Returns the number of rows added.
+    """
+    # pandas and pyarrow are imported here rather than at module level so that
+    # store_version() and list_months() stay cheap on the app's first paint.
+    df = df[KEY_COLUMNS].dropna(subset=["DATE"]).drop_duplicates()
+    if df.empty:
+        return 0
+
+    added = 0
+    # Group on periods and only format the handful of distinct months; strftime
+    # over every row dominated the append time on large statements.
+    months = df["DATE"].dt.to_period("M")
+    os.makedirs(STORE_DIR, exist_ok=True)
+    with _write_lock:
+        for period, part in df.groupby(months, sort=True):
+            month = period.strftime("%Y-%m")
+            # The de-duplication reads the partition before writing to it, so
+            # other processes (batch workers, other app servers) must wait.
+            with file_lock(_lock_path(month)):
+                existing = _read_partition_keys(month)
+                if existing is not None:
+                    existing["DATE"] = existing["DATE"].astype(part["DATE"].dtype)
+                    merged = part.merge(existing.drop_duplicates(), on=KEY_COLUMNS, how="left", indicator=True)
+                    part = merged.loc[merged["_merge"] == "left_only", KEY_COLUMNS]
+                if part.empty:
+                    continue
+
+                os.makedirs(_partition_dir(month), exist_ok=True)
+                path = os.path.join(_partition_dir(month), f"part-{uuid.uuid4().hex}.parquet")
+                tmp_path = f"{path}.tmp"
+                part.to_parquet(tmp_path, index=False)
+                os.replace(tmp_path, path)
+                added += len(part)
+    return added
+
+
+@metrics.timed("history_query")
+def query_transactions(start=None, end=None, columns=None):
+    """Read stored transactions between two dates (inclusive), oldest first.
+
+    The date bounds prune whole month partitions before any file is opened and
+    are pushed down to the Parquet row groups that remain.
+    """
+    import pandas as pd
+    import pyarrow as pa
+    import pyarrow.dataset as ds
+
+    columns = columns or KEY_COLUMNS
+    if not _part_files():
+        return pd.DataFrame(columns=columns)
+
+    dataset = ds.dataset(STORE_DIR, format="parquet", partitioning="hive")
+    conditions = []
+    if start is not None:
+        start = pd.Timestamp(start)
+        conditions.append(ds.field("month") >= start.strftime("%Y-%m"))
+        conditions.append(ds.field("DATE") >= pa.scalar(start.to_pydatetime(), pa.timestamp("ns")))
+    if end is not None:
+        # Inclusive of the whole end day.
+        end = pd.Timestamp(end).normalize() + pd.Timedelta(days=1)
+        conditions.append(ds.field("month") <= (end - pd.Timedelta(days=1)).strftime("%Y-%m"))
+        conditions.append(ds.field("DATE") < pa.scalar(end.to_pydatetime(), pa.timestamp("ns")))
+
+    expression = None
+    for condition in conditions:
+        expression = condition if expression is None else expression & condition
+
+    table = dataset.to_table(columns=columns, filter=expression)
+    df = table.to_pandas()
+    if "DATE" in df.columns:
+        df = df.sort_values("DATE", kind="stable")
+    return df.reset_index(drop=True)
@@ -1,345 +1,721 @@
 import streamlit as st
-import pandas as pd
-import plotly.express as px
-import json
+import calendar
+import datetime
+import logging
 import os
-import sys
-import subprocess
+import importlib.util
+
+# pandas, pyarrow and plotly are only imported once there is data to show, so the
+# title and uploader paint without waiting for them. financeapp resolves its
+# exports lazily and transaction_store only needs them for reads and writes.
+import financeapp
+from financeapp import transaction_store
+from financeapp.cache import StatementCache
 
 # Set Java home path for JPype
 os.environ['JAVA_HOME'] = '/Library/Internet Plug-Ins/JavaAppletPlugin.plugin/Contents/Home'
 
-# Set Java options for better performance with large PDFs
-os.environ['_JAVA_OPTIONS'] = '-Xmx1024m -XX:ReservedCodeCacheSize=256m'
-
 st.set_page_config(page_title='Finance App', page_icon=':bar_chart:',layout="wide")
 category_file = "categories.json"
+budget_file = "budgets.json"
 
-if "categories" not in st.session_state:
-    st.session_state.categories = {
-        "Uncategorised": [],
-    }
-    
-if os.path.exists(category_file):
-        with open(category_file,"r") as f:
-            st.session_state.categories=json.load(f)
-            
-def save_categories():
-    with open(category_file,"w") as f:
-        json.dump(st.session_state.categories,f)
-def categorise_transaction(df):
-    df["CATEGORY"] = "Uncategorised"
-    
-    for category, keywords in st.session_state.categories.items():
-        if category == "Uncategorised" or not keywords:
-            continue
-        
-        lower_keywords=[keyword for keyword in keywords]
-        
-        for idx,row in df.iterrows():
-            details=row["PARTICULARS"]
-            if details in lower_keywords:
-                df.at[idx,"CATEGORY"]= category
-    return df
-
-def check_java_installed():
-    """Check if Java is installed on the system and set JAVA_HOME if needed."""
-    try:
-        # Try to get Java version
-        java_version = subprocess.check_output(['java', '-version'], stderr=subprocess.STDOUT)
-        
-        # If we're on macOS, try to get the Java home path
-        if sys.platform == 'darwin':
-            try:
-                java_home = subprocess.check_output(['/usr/libexec/java_home'], text=True).strip()
-                if java_home and os.path.exists(java_home):
-                    os.environ['JAVA_HOME'] = java_home
-                    return True
-            except:
-                # If /usr/libexec/java_home fails, we'll use the hardcoded path
-                pass
-                
-        return True
-    except (subprocess.CalledProcessError, FileNotFoundError):
-        return False
+LARGE_CSV_BYTES = 20 * 1024 * 1024
 
-def load_transactions(file):
+logger = logging.getLogger(__name__)
+
+@st.cache_resource
+def get_category_store():
+    # One store per process: sessions share the parsed categories and the compiled
+    # matcher, and edits are merged into categories.json under a file lock.
+    return financeapp.category_store.CategoryStore(category_file)
+
+category_store = get_category_store()
+# A stat() of categories.json per run; it is only parsed again after a change.
+st.session_state.categories = category_store.categories()
+
+def read_pdf_transactions(file):
+    if importlib.util.find_spec("jpype") is None:
+        st.warning("Using fallback method for PDF processing. For better performance, install JPype1: pip install JPype1")
+
+    # Encrypted PDFs with an empty user password open without one, so only ask
+    # for a password once extraction has actually been refused.
     try:
-        file_type = file.name.split('.')[-1].lower()
-        
-        if file_type == 'csv':
-            # Handle CSV files
-            df = pd.read_csv(file)
-        elif file_type == 'pdf':
-            # Check if Java is installed
-            if not check_java_installed():
-                st.error("Java is required to read PDF files. Please install Java from https://www.java.com/download/ and restart the application.")
-                return None
-            
-            # Try to use tabula with subprocess approach if JPype fails
-            try:
-                # First try to import tabula normally
-                try:
-                    import tabula
-                    import warnings
-                    # Suppress font warnings
-                    warnings.filterwarnings('ignore', message='.*font.*')
-                    use_subprocess = False
-                except ImportError:
-                    st.warning("Using fallback method for PDF processing. For better performance, install JPype1: pip install JPype1")
-                    import tabula
-                    use_subprocess = True
-                
-                # Check if PDF is password-protected
-                password = None
-                try:
-                    # First try without password
-                    if use_subprocess:
-                        tables = tabula.read_pdf(file, pages="1", multiple_tables=True, stream=True, 
-                                               output_format="dataframe", lattice=True, silent=True)
-                    else:
-                        tables = tabula.read_pdf(file, pages="1", multiple_tables=True, stream=True, 
-                                               lattice=True, silent=True)
-                except Exception as e:
-                    if "password is incorrect" in str(e) or "Cannot decrypt PDF" in str(e):
-                        # PDF is password-protected, ask for password
-                        password = st.text_input("This PDF is password-protected. Please enter the password:", type="password")
-                        if not password:
-                            st.error("Password is required to read this PDF file.")
-                            return None
-                
-                # Read PDF file with password if provided
-                try:
-                    if use_subprocess:
-                        tables = tabula.read_pdf(file, pages="all", multiple_tables=True, stream=True, 
-                                               output_format="dataframe", password=password,
-                                               lattice=True, silent=True, guess=False)
-                    else:
-                        tables = tabula.read_pdf(file, pages="all", multiple_tables=True, stream=True, 
-                                               password=password, lattice=True, silent=True, guess=False)
-                    
-                    if not tables:
-                        st.error("No tables found in the PDF file.")
-                        return None
-                        
-                    # Use the first table found
-                    df = tables[0]
-                    for table in tables[1:]:
-                        df = pd.concat([df, table], ignore_index=True)
-                except Exception as e:
-                    if password and ("password is incorrect" in str(e) or "Cannot decrypt PDF" in str(e)):
-                        st.error("The password you entered is incorrect.")
-                    else:
-                        st.error(f"Error reading PDF: {str(e)}")
-                    return None
-            except Exception as e:
-                st.error(f"Error reading PDF: {str(e)}")
-                st.error("Make sure Java is installed correctly and the JAVA_HOME environment variable is set.")
-                return None
-        else:
-            st.error(f"Unsupported file type: {file_type}. Please upload a CSV or PDF file.")
-            return None
-            
-        # Process the dataframe
         try:
-            # Clean column names
-            df.columns = [col.strip() for col in df.columns]
-            
-            # Check if required columns exist
-            required_columns = ["DATE", "PARTICULARS", "DEPOSITS", "WITHDRAWALS", "BALANCE"]
-            missing_columns = [col for col in required_columns if col not in df.columns]
-            
-            if missing_columns:
-                st.error(f"The following required columns are missing from the file: {', '.join(missing_columns)}")
-                st.write("Available columns:", ", ".join(df.columns))
+            with st.spinner("Extracting tables from PDF..."):
+                return financeapp.load_statement(file)
+        except financeapp.PdfPasswordError:
+            password = st.text_input(f"{file.name} is password-protected. Please enter the password:",
+                                     type="password", key=f"pdf_password_{hash_file(file)}")
+            if not password:
+                st.error("Password is required to read this PDF file.")
                 return None
-            
-            # Process numeric columns - first convert to string if needed
-            # Handle DEPOSITS column
-            try:
-                if df["DEPOSITS"].dtype != 'object':
-                    df["DEPOSITS"] = df["DEPOSITS"].astype(str)
-                df["DEPOSITS"] = df["DEPOSITS"].str.replace(",", "").astype(float)
-            except Exception as e:
-                st.warning(f"Issue processing DEPOSITS column: {str(e)}")
-                # Try direct conversion if string operations fail
-                try:
-                    df["DEPOSITS"] = pd.to_numeric(df["DEPOSITS"], errors='coerce')
-                except:
-                    pass
-                
-            # Handle WITHDRAWALS column
-            try:
-                if df["WITHDRAWALS"].dtype != 'object':
-                    df["WITHDRAWALS"] = df["WITHDRAWALS"].astype(str)
-                df["WITHDRAWALS"] = df["WITHDRAWALS"].str.replace(",", "").astype(float)
-            except Exception as e:
-                st.warning(f"Issue processing WITHDRAWALS column: {str(e)}")
-                # Try direct conversion if string operations fail
-                try:
-                    df["WITHDRAWALS"] = pd.to_numeric(df["WITHDRAWALS"], errors='coerce')
-                except:
-                    pass
-                
-            # Handle BALANCE column
-            try:
-                if df["BALANCE"].dtype != 'object':
-                    df["BALANCE"] = df["BALANCE"].astype(str)
-                df["BALANCE"] = df["BALANCE"].str.replace(",", "").astype(float)
-            except Exception as e:
-                st.warning(f"Issue processing BALANCE column: {str(e)}")
-                # Try direct conversion if string operations fail
-                try:
-                    df["BALANCE"] = pd.to_numeric(df["BALANCE"], errors='coerce')
-                except:
-                    pass
-            
-            # Process date column with multiple format support
-            try:
-                # First try with the expected format
-                df['DATE'] = pd.to_datetime(df['DATE'], format="%d-%b-%Y")
-            except Exception as e:
-                st.warning(f"Could not parse dates with format %d-%b-%Y, trying alternative formats: {str(e)}")
-                try:
-                    # Try with automatic format detection
-                    df['DATE'] = pd.to_datetime(df['DATE'], errors='coerce')
-                    
-                    # Check if we have any valid dates
-                    if df['DATE'].isna().all():
-                        st.error("Could not parse any dates in the DATE column.")
-                        return None
-                except Exception as e2:
-                    st.error(f"Failed to parse dates: {str(e2)}")
-                    return None
-            
-            # Sort by date
-            df = df.sort_values(by=['DATE'])
-        except Exception as e:
-            st.error(f"Error processing data: {str(e)}")
-            st.write("Please make sure your file has the correct format with columns: DATE, PARTICULARS, DEPOSITS, WITHDRAWALS, BALANCE")
-            return None
-        
-        return categorise_transaction(df)
-        
+            with st.spinner("Extracting tables from PDF..."):
+                return financeapp.load_statement(file, password=password)
+    except financeapp.PdfPasswordError:
+        st.error("The password you entered is incorrect.")
+        return None
+    except financeapp.StatementError:
+        raise
+    except Exception as e:
+        st.error(f"Error reading PDF: {str(e)}")
+        st.error("Make sure Java is installed correctly and the JAVA_HOME environment variable is set.")
+        return None
+
+def read_transactions(file):
+    try:
+        if financeapp.ingest.file_type(file.name) == 'pdf':
+            return read_pdf_transactions(file)
+        return financeapp.load_statement(file)
+    except financeapp.StatementError as e:
+        st.error(str(e))
+        return None
     except Exception as e:
         error_msg = f"Error loading transactions: {str(e)}"
         if hasattr(e, '__traceback__'):
             error_msg += f" in line {e.__traceback__.tb_lineno}"
         st.error(error_msg)
-        print(error_msg)
+        logger.exception("Error loading transactions from %s", file.name)
         return None
+
+@st.cache_resource
+def get_statement_cache():
+    # Shared by every session in the process; entries are immutable once stored.
+    return StatementCache()
+
+def hash_file(file):
+    return financeapp.ingest.hash_bytes(file.getvalue())
+
+def show_coercion_failures(df, name):
+    failures = df.attrs.get("coercion_failures")
+    if failures:
+        summary = ", ".join(f"{col} ({count} rows)" for col, count in failures.items())
+        st.warning(f"Some values in {name} could not be read and were left blank: {summary}")
+        with st.expander(f"Show affected rows in {name}"):
+            st.dataframe(df.loc[df.attrs["failed_rows"]], use_container_width=True)
+
+@financeapp.metrics.timed("read_statements")
+def read_statements(files, hashes):
+    """Normalised frames for the uploaded files (None where reading failed), parsing cache misses in parallel."""
+    cache = get_statement_cache()
+    # Statements that needed a password stay in this session; the shared cache
+    # would hand them to any session uploading the same file.
+    protected = st.session_state.setdefault("protected_statements", {})
+    for key in [key for key in protected if key not in hashes]:
+        del protected[key]
+    frames = [protected.get(file_hash, cache.get(file_hash)) for file_hash in hashes]
+    missing = [i for i, frame in enumerate(frames) if frame is None]
+    if not missing:
+        return frames
+
+    progress = st.progress(0.0, text=f"Reading {len(missing)} statements...")
+    done = 0
+    def on_loaded(index, result):
+        nonlocal done
+        done += 1
+        progress.progress(done / len(missing), text=f"Read {done} of {len(missing)} statements")
+    results = financeapp.accounts.load_statements([files[i] for i in missing], on_loaded=on_loaded)
+    progress.empty()
+
+    for i, result in zip(missing, results):
+        needs_password = False
+        if isinstance(result, financeapp.PdfPasswordError):
+            # Asking for the password needs the script thread, so these go one by one.
+            result = read_transactions(files[i])
+            needs_password = True
+        elif isinstance(result, financeapp.StatementError):
+            st.error(f"{files[i].name}: {result}")
+            result = None
+        elif isinstance(result, Exception):
+            st.error(f"Error loading transactions from {files[i].name}: {str(result)}")
+            result = None
+        if result is None:
+            continue
+        if needs_password:
+            protected[hashes[i]] = result
+        else:
+            cache.put(hashes[i], result)
+        frames[i] = result
+        try:
+            added = transaction_store.append_transactions(result)
+            if added:
+                st.toast(f"Added {added} new transactions to your history")
+        except Exception as e:
+            logger.warning("Could not save transactions to history: %s", e)
+    return frames
+
+def choose_accounts(files, hashes, frames):
+    """Guess which statements belong to the same account and let the user rename or regroup them."""
+    import pandas as pd
+
+    labels = financeapp.accounts.guess_accounts(frames)
+    if len(frames) < 2:
+        return labels
+    spans = [financeapp.accounts.statement_span(frame) for frame in frames]
+    with st.expander(f"Accounts ({len(set(labels))} found in {len(frames)} statements)"):
+        st.caption("Statements that overlap or continue each other's balance are grouped into one account. "
+                   "Rename an account here, or give statements the same name to combine them.")
+        table = pd.DataFrame({
+            "FILE": [file.name for file in files],
+            "FROM": [span[0] if span else None for span in spans],
+            "TO": [span[1] if span else None for span in spans],
+            "ROWS": [len(frame) for frame in frames],
+            "ACCOUNT": labels,
+        })
+        edited = st.data_editor(
+            table,
+            column_config={
+                "FROM": st.column_config.DateColumn("FROM", format="DD/MM/YYYY"),
+                "TO": st.column_config.DateColumn("TO", format="DD/MM/YYYY"),
+            },
+            disabled=["FILE", "FROM", "TO", "ROWS"],
+            hide_index=True,
+            use_container_width=True,
+            key=f"accounts_{hash(tuple(hashes))}",
+        )
+    # A cleared cell falls back to the guess.
+    return [label.strip() if isinstance(label, str) and label.strip() else guess
+            for label, guess in zip(edited["ACCOUNT"], labels)]
+
+def load_statement_files(files):
+    """Read, merge and categorise uploaded statements; returns (df, source key) or (None, None)."""
+    # The same file picked twice adds nothing.
+    unique = {}
+    for file in files:
+        unique.setdefault(hash_file(file), file)
+    hashes, files = list(unique), list(unique.values())
+
+    frames = read_statements(files, hashes)
+    loaded = [i for i, frame in enumerate(frames) if frame is not None]
+    if not loaded:
+        return None, None
+    files, hashes, frames = [files[i] for i in loaded], [hashes[i] for i in loaded], [frames[i] for i in loaded]
+    for file, frame in zip(files, frames):
+        show_coercion_failures(frame, file.name)
+
+    accounts = choose_accounts(files, hashes, frames)
+    source_key = (tuple(hashes), tuple(accounts))
+    combined = st.session_state.get("combined")
+    if combined is None or combined[0] != source_key:
+        combined = (source_key, financeapp.accounts.combine_statements(frames, accounts))
+        st.session_state.combined = combined
+    df = combined[1]
+
+    duplicates = sum(df.attrs["duplicates"])
+    if duplicates:
+        st.info(f"Skipped {duplicates} transactions that appear in more than one statement.")
+    for account, gaps in df.attrs["gaps"].items():
+        for last, first in gaps:
+            st.warning(f"{account}: the balance on {first:%d/%m/%Y} does not follow from the one on "
+                       f"{last:%d/%m/%Y}; a statement may be missing.")
+
+    return categorised(source_key, lambda: df), source_key
+
+def categorised(source_key, load):
+    """The categorised frame for source_key, recomputed only when the data or categories.json change.
+
+    load returns the uncategorised frame; it is only called on a miss, and a copy
+    is categorised so the frame it returns stays untouched.
+    """
+    # A run can categorise both the uploads and the stored history, so each
+    # source keeps its own entry; only the two most recent are kept.
+    frames = st.session_state.setdefault("categorised", {})
+    cached = frames.pop(source_key, None)
+    if cached is None or cached[0] != category_store.version:
+        cached = (category_store.version, financeapp.categorise_transaction(load().copy(), category_store.matcher()))
+    frames[source_key] = cached
+    while len(frames) > 2:
+        del frames[next(iter(frames))]
+    return cached[1]
+
+def load_large_statement(file):
+    # Keyed by the categories as well, since the totals depend on them.
+    key = (hash_file(file), category_store.version)
+    summaries = st.session_state.setdefault("chunked_summaries", {})
+    if key in summaries:
+        return summaries[key]
+
+    progress = st.empty()
+    try:
+        with st.spinner("Reading large statement in chunks..."):
+            summary = financeapp.ingest_csv_in_chunks(
+                file, category_store.matcher(), on_chunk=lambda summary: progress.text(f"Processed {summary.rows:,} rows")
+            )
+    except Exception as e:
+        st.error(f"Error loading transactions: {str(e)}")
+        return None
+    progress.empty()
+    summaries[key] = summary
+    return summary
+
+def load_large_statements(files):
+    """Chunked summaries of the large uploads merged into one; None if none could be read.
+
+    Rows shared by overlapping statements are counted once. Finding them reads
+    the overlapping files again, so the merged summary is kept for the session.
+    """
+    # The same file picked twice adds nothing.
+    files = list({hash_file(file): file for file in files}.values())
+    keys = {(hash_file(file), category_store.version) for file in files}
+    summaries = st.session_state.setdefault("chunked_summaries", {})
+    # Keep only the files still uploaded, read with the current categories.
+    for key in [key for key in summaries if key not in keys]:
+        del summaries[key]
+    loaded = [(file, summary) for file, summary in zip(files, map(load_large_statement, files)) if summary is not None]
+    if not loaded:
+        return None
+    if len(loaded) == 1:
+        return loaded[0][1]
+
+    merged_key = (tuple(hash_file(file) for file, _ in loaded), category_store.version)
+    merged = st.session_state.get("chunked_merged")
+    if merged is None or merged[0] != merged_key:
+        with st.spinner("Matching transactions shared by the large statements..."):
+            merged = (merged_key, financeapp.accounts.merge_summaries(
+                [file for file, _ in loaded], [summary for _, summary in loaded], category_store.matcher()))
+        st.session_state.chunked_merged = merged
+    return merged[1]
+
+def show_statement_summary(summary):
+    import plotly.express as px
+
+    if summary.statements > 1:
+        st.info(f"These {summary.statements} statements have {summary.rows:,} rows, so only their combined totals "
+                "are shown here, with transactions shared by overlapping statements counted once and the balance "
+                "taken as that of one account. Turn on \"Show all stored "
+                "statements\" in the sidebar to browse and edit the transactions.")
+    else:
+        st.info(f"This statement has {summary.rows:,} rows, so only its totals are shown here. "
+                "Turn on \"Show all stored statements\" in the sidebar to browse and edit the transactions.")
+    if summary.coercion_failures:
+        failed = ", ".join(f"{col} ({count} rows)" for col, count in summary.coercion_failures.items())
+        st.warning(f"Some values could not be read and were left blank: {failed}")
+
+    tab1, tab2, tab3 = st.tabs(["Spent Money 💸", "Earned Money 🤑", "Balance 💰"])
+    with tab1:
+        st.subheader('Expense Summary')
+        category_totals = summary.category_totals_frame()
+        st.dataframe(
+            category_totals,
+            column_config={
+             "WITHDRAWALS": st.column_config.NumberColumn("WITHDRAWALS", format="%.2f INR")
+            },
+            use_container_width=True,
+            hide_index=True
+        )
+        st.plotly_chart(px.pie(category_totals, values="WITHDRAWALS", names="CATEGORY",
+                               title="Expenses by Category"), use_container_width=True)
+    with tab2:
+        st.subheader("Payments Summary")
+        st.metric("Total Payments", f"{summary.total_deposits:,.2f} INR")
+    with tab3:
+        st.subheader("Balance Summary")
+        balance_summary = summary.daily_balance_frame()
+        st.dataframe(balance_summary, use_container_width=True)
+        st.plotly_chart(px.line(balance_summary, x="DATE", y="DAILY BALANCE", title="Balance Over Time"),
+                        use_container_width=True)
+
+@st.cache_data(show_spinner=False, max_entries=32)
+def _query_history(start, end, version):
+    # version is only part of the cache key, so an append invalidates the entry.
+    return transaction_store.query_transactions(start, end)
+
+def load_history(start=None, end=None):
+    """Stored transactions between two dates, categorised; returns (df, source key)."""
+    version = transaction_store.store_version()
+    source_key = ("history", start, end, version)
+    return categorised(source_key, lambda: _query_history(start, end, version)), source_key
+
+def history_months(start=None, end=None):
+    """A fingerprint of each stored month a history range covers, for get_analytics.
+
+    The store only grows, so a month's rows change only when its part files do
+    or when the range starts or ends inside it.
+    """
+    start_month = f"{start:%Y-%m}" if start else None
+    end_month = f"{end:%Y-%m}" if end else None
+    return {month: (version, start if month == start_month else None, end if month == end_month else None)
+            for month, version in transaction_store.month_versions().items()
+            if (start_month is None or month >= start_month) and (end_month is None or month <= end_month)}
+
+def get_aggregates(source_key, df):
+    """Reuse this session's rollups for the same data, folding in any category changes."""
+    cached = st.session_state.get("aggregates")
+    if cached is not None and cached[0] == source_key and cached[1].categories.index.equals(df.index):
+        aggregates = cached[1]
+        aggregates.update_categories(df["CATEGORY"])
+        return aggregates
+
+    aggregates = financeapp.TransactionAggregates(df)
+    st.session_state.aggregates = (source_key, aggregates)
+    return aggregates
+def get_analytics(source_key, df, months=None):
+    """Like get_aggregates, for the spending trends; category changes only recompute their months.
+
+    months (see history_months) lets a new source that only adds rows to the
+    cached one, like the history after a store append, recompute just the
+    months whose fingerprint changed rather than every month.
+    """
+    cached = st.session_state.get("analytics")
+    if cached is not None and cached[0] == source_key:
+        analytics = cached[1]
+        analytics.update_categories(df)
+    elif (cached is not None and months is not None and cached[2] is not None
+          and cached[3] == category_store.version and cached[2].keys() <= months.keys()):
+        # Same categories, so the rows of unchanged months are categorised as before.
+        analytics = cached[1]
+        analytics.refresh(df, [month for month, fingerprint in months.items() if cached[2].get(month) != fingerprint])
+    else:
+        analytics = financeapp.SpendingAnalytics(df)
+    st.session_state.analytics = (source_key, analytics, months, category_store.version)
+    return analytics
+
+def show_trends(analytics, df, account_columns):
+    import plotly.express as px
+
+    st.subheader("Spending over Time")
+    weekly = st.radio("Period", ["Monthly", "Weekly"], horizontal=True, key="trends_period") == "Weekly"
+    spend = analytics.spend("W" if weekly else "M")
+    if spend.empty:
+        st.info("There are no withdrawals to show.")
+        return
+    with financeapp.metrics.stage("chart", chart="spend_trend"):
+        fig = px.bar(spend, x="PERIOD", y="SPENT", color="CATEGORY",
+                     title="Weekly Spend by Category" if weekly else "Monthly Spend by Category")
+        if not weekly:
+            # The rolling average of the total is the sum of the categories' averages.
+            average = spend.groupby("PERIOD", as_index=False)["ROLLING AVERAGE"].sum()
+            fig.add_scatter(x=average["PERIOD"], y=average["ROLLING AVERAGE"], mode="lines",
+                            name=f"{analytics.window}-month average", line=dict(color="black"))
+    st.plotly_chart(fig, use_container_width=True)
+
+    st.subheader("Budgets")
+    budgets = financeapp.analytics.load_budgets(budget_file)
+    months = [str(month) for month in analytics.monthly.index[::-1]]
+    month = st.selectbox("Month", options=months, key="budget_month")
+    with st.expander("Set monthly budgets"):
+        import pandas as pd
+
+        budget_table = pd.DataFrame({"CATEGORY": list(st.session_state.categories)})
+        budget_table["BUDGET"] = budget_table["CATEGORY"].map(budgets).astype("float64")
+        edited = st.data_editor(
+            budget_table,
+            column_config={"BUDGET": st.column_config.NumberColumn("BUDGET", min_value=0, format="%.2f INR")},
+            disabled=["CATEGORY"],
+            hide_index=True,
+            use_container_width=True,
+            key="budget_editor",
+        )
+        if st.button("Save Budgets"):
+            budgets = {category: float(amount) for category, amount in zip(edited["CATEGORY"], edited["BUDGET"])
+                       if pd.notna(amount) and amount > 0}
+            financeapp.analytics.save_budgets(budgets, budget_file)
+            st.success("Budgets saved")
+    report = analytics.budget_report(budgets, month)
+    if report.empty:
+        st.caption("Set a budget for a category to compare it with what you spent.")
+    else:
+        st.dataframe(
+            report.assign(USED=report["USED"] * 100),
+            column_config={
+                "BUDGET": st.column_config.NumberColumn("BUDGET", format="%.2f INR"),
+                "SPENT": st.column_config.NumberColumn("SPENT", format="%.2f INR"),
+                "REMAINING": st.column_config.NumberColumn("REMAINING", format="%.2f INR"),
+                "USED": st.column_config.ProgressColumn("USED", format="%.0f%%", min_value=0, max_value=100),
+                "ROLLING AVERAGE": st.column_config.NumberColumn("ROLLING AVERAGE", format="%.2f INR"),
+            },
+            use_container_width=True,
+            hide_index=True
+        )
+
+    st.subheader("Unusual Withdrawals")
+    st.caption("Withdrawals far larger than is usual for their category.")
+    outliers = analytics.outliers(df)
+    if outliers.empty:
+        st.caption("None found.")
+    else:
+        st.dataframe(
+            outliers[["DATE", *account_columns, "PARTICULARS", "WITHDRAWALS", "CATEGORY", "Z"]],
+            column_config={
+                "DATE": st.column_config.DateColumn("DATE", format="DD/MM/YYYY"),
+                "WITHDRAWALS": st.column_config.NumberColumn("WITHDRAWALS", format="%.2f INR"),
+                "Z": st.column_config.NumberColumn("Z", format="%.1f", help="Standard deviations above the category's usual amount"),
+            },
+            use_container_width=True,
+            hide_index=True
+        )
+
+def add_keywords_to_categories(pairs):
+    """Add (category, PARTICULARS or keyword) pairs to categories.json; returns how many were new."""
+    added = category_store.add_keywords(pairs)
+    st.session_state.categories = category_store.categories()
+    return added
+
 def add_keyword_to_category(category, keyword):
-    keyword = keyword.strip()
-    if keyword and keyword not in st.session_state.categories[category]:
-        st.session_state.categories[category].append(keyword)
-        save_categories()
-        return True
-    
-    return False
+    return add_keywords_to_categories([(category, keyword)]) > 0
+
+def apply_category_edits(editor_state, view):
+    """Apply the data editor's CATEGORY edits to st.session_state.df, touching only edited rows."""
+    import pandas as pd
+
+    edited_rows = editor_state.get("edited_rows", {})
+    changes = {int(pos): values["CATEGORY"] for pos, values in edited_rows.items()
+               if values.get("CATEGORY") is not None}
+    if not changes:
+        return 0
+
+    df = st.session_state.df
+    # The editor reports positions within the page it was shown; the page keeps
+    # the index labels of st.session_state.df, so they map straight back.
+    labels = view.index[list(changes)]
+    new_categories = pd.Series(list(changes.values()), index=labels)
+    new_categories = new_categories[financeapp.categorise.category_changes(df.loc[labels, "CATEGORY"], new_categories)]
+    if new_categories.empty:
+        return 0
+
+    df["CATEGORY"] = financeapp.categorise.assign_categories(df["CATEGORY"], new_categories)
+    add_keywords_to_categories(zip(new_categories, df.loc[new_categories.index, "PARTICULARS"].astype(str)))
+    return len(new_categories)
+def table_window_controls(key, df, columns, amount_column, with_categories=False):
+    """Render filter, sort and paging widgets and return the visible page and its editor key."""
+    with st.expander("Filter and sort"):
+        filter_cols = st.columns(3)
+        dates = df["DATE"].dropna()
+        date_range = ()
+        if not dates.empty:
+            first_day, last_day = dates.min().date(), dates.max().date()
+            date_range = filter_cols[0].date_input("Date range", value=(first_day, last_day),
+                                                   min_value=first_day, max_value=last_day,
+                                                   key=f"{key}_dates")
+        min_amount = filter_cols[1].number_input("Minimum amount", value=None, key=f"{key}_min")
+        max_amount = filter_cols[2].number_input("Maximum amount", value=None, key=f"{key}_max")
+        categories = None
+        if with_categories:
+            categories = st.multiselect("Categories", options=list(st.session_state.categories.keys()),
+                                        key=f"{key}_categories")
+        accounts = None
+        if "ACCOUNT" in columns:
+            accounts = st.multiselect("Accounts", options=list(df["ACCOUNT"].unique()), key=f"{key}_accounts")
+        sort_cols = st.columns(3)
+        sort_by = sort_cols[0].selectbox("Sort by", options=columns, key=f"{key}_sort")
+        ascending = sort_cols[1].toggle("Ascending", value=True, key=f"{key}_ascending")
+        page_size = sort_cols[2].selectbox("Rows per page", options=financeapp.paging.PAGE_SIZES, index=1, key=f"{key}_page_size")
+
+    filters = dict(
+        start=date_range[0] if len(date_range) > 0 else None,
+        end=date_range[1] if len(date_range) > 1 else None,
+        categories=tuple(categories or ()),
+        accounts=tuple(accounts or ()),
+        min_amount=min_amount,
+        max_amount=max_amount,
+    )
+    mask = financeapp.filter_transactions(df, amount_column, **filters)
+    total = int(mask.sum())
+    pages = max(1, -(-total // page_size))
+
+    # Changing the filters, sort or page size starts again from page 1 with a
+    # fresh editor, so pending edits never land on the wrong rows.
+    view_id = hash((tuple(filters.items()), sort_by, ascending, page_size))
+    page = st.number_input(f"Page (of {pages})", min_value=1, max_value=pages, value=1,
+                           key=f"{key}_page_{view_id}")
+    view = financeapp.window_transactions(df, mask, columns, sort_by, ascending, page, page_size)
+    first = (page - 1) * page_size
+    st.caption(f"Showing rows {min(first + 1, total)}-{first + len(view)} of {total}")
+    return view, f"{key}_editor_{view_id}_{page}"
 def main():
     # Load data from CSV file
     st.title('Financial Data Analysis')
-    uploaded_file = st.file_uploader("Upload a CSV file", type=["csv","pdf"])
+    uploaded_files = st.file_uploader("Upload CSV or PDF statements", type=["csv","pdf"], accept_multiple_files=True)
     
-    if uploaded_file is not None:
-        df = load_transactions(uploaded_file)
-        
-        if df is not None:
-            # Store the dataframe in session state
-            st.session_state.df = df
-            tab1, tab2, tab3 = st.tabs(["Spent Money 💸", "Earned Money 🤑", "Balance 💰"])
-            with tab1:
-                new_category_name=st.text_input("Enter the name of the category:")
-                add_button = st.button("Add Category")
-                if add_button and new_category_name:
-                    if new_category_name not in st.session_state.categories:
-                        st.session_state.categories[new_category_name]=[]
-                        save_categories()
-                        st.success(f"{new_category_name} category successfully added")
-                        st.rerun()
-                    elif new_category_name in st.session_state.categories.keys():
-                        st.warning("Category already exists!")
-                st.subheader("Your Expenses")
-                edited_df = st.data_editor(
-                    st.session_state.df[["DATE","PARTICULARS","WITHDRAWALS","CATEGORY"]],
-                    column_config={
-                        "DATE": st.column_config.DateColumn("DATE", format="DD/MM/YYYY"),
-                        "WITHDRAWALS": st.column_config.NumberColumn("WITHDRAWALS", format="%.2f INR"),
-                        "CATEGORY": st.column_config.SelectboxColumn(
-                            "CATEGORY",
-                            options=list(st.session_state.categories.keys())
-                        )
-                    },
-                    hide_index=True,
-                    use_container_width=True,
-                    key="category_editor"
-                )
-                
-                save_button = st.button("Apply Changes", type="primary")
-                if save_button:
-                    for idx, row in edited_df.iterrows():
-                        new_category = row["CATEGORY"]
-                        if new_category == st.session_state.df.at[idx, "CATEGORY"]:
-                            continue
-                        
-                        details = row["PARTICULARS"]
-                        st.session_state.df.at[idx, "CATEGORY"] = new_category
-                        add_keyword_to_category(new_category, details)
-                        
-                st.subheader('Expense Summary')
-                category_totals = st.session_state.df.groupby("CATEGORY")["WITHDRAWALS"].sum().reset_index()
-                category_totals = category_totals.sort_values("WITHDRAWALS", ascending=False)
-                
+    df = None
+    summary = None
+    source_key = None
+    months = None
+    large_files = [file for file in uploaded_files
+                   if file.name.lower().endswith(".csv") and file.size > LARGE_CSV_BYTES]
+    statement_files = [file for file in uploaded_files if file not in large_files]
+    if large_files:
+        # Large CSVs go straight into the stored history and are only shown as totals.
+        summary = load_large_statements(large_files)
+    if statement_files:
+        if large_files:
+            st.info(f"Large statements are only added to your stored history: {', '.join(file.name for file in large_files)}. "
+                    "Turn on \"Show all stored statements\" to include them.")
+        df, source_key = load_statement_files(statement_files)
+        summary = None
+
+    stored_months = transaction_store.list_months()
+    if stored_months:
+        with st.sidebar:
+            st.header("Stored History")
+            # Off by default: the store is shared by every session and batch run, not kept per user.
+            show_history = st.toggle("Show all stored statements", value=False)
+            first_day = datetime.date.fromisoformat(stored_months[0] + "-01")
+            last_year, last_month = map(int, stored_months[-1].split("-"))
+            last_day = datetime.date(last_year, last_month, calendar.monthrange(last_year, last_month)[1])
+            date_range = st.date_input("Date range", value=(first_day, last_day),
+                                       min_value=first_day, max_value=last_day,
+                                       disabled=not show_history)
+        if show_history:
+            # While the user is picking the second date only one bound is set.
+            start = date_range[0] if len(date_range) > 0 else None
+            end = date_range[1] if len(date_range) > 1 else None
+            # Fingerprinted first, so an append in between shows up as a change next run.
+            months = history_months(start, end)
+            df, source_key = load_history(start, end)
+            summary = None
+
+    if summary is not None:
+        show_statement_summary(summary)
+    elif df is not None and not df.empty:
+        # Store the dataframe in session state
+        st.session_state.df = df
+        aggregates = get_aggregates(source_key, df)
+        analytics = get_analytics(source_key, df, months)
+        account_totals = aggregates.account_totals()
+        # The account column and breakdowns only appear once there is more than one account.
+        account_columns = ["ACCOUNT"] if account_totals is not None else []
+        import plotly.express as px
+
+        tab1, tab2, tab3, tab4 = st.tabs(["Spent Money 💸", "Earned Money 🤑", "Balance 💰", "Trends 📈"])
+        with tab1:
+            new_category_name=st.text_input("Enter the name of the category:")
+            add_button = st.button("Add Category")
+            if add_button and new_category_name:
+                if category_store.add_category(new_category_name):
+                    st.success(f"{new_category_name} category successfully added")
+                    st.rerun()
+                else:
+                    st.warning("Category already exists!")
+            st.subheader("Your Expenses")
+            expenses_view, editor_key = table_window_controls(
+                "expenses", st.session_state.df, ["DATE", *account_columns, "PARTICULARS","WITHDRAWALS","CATEGORY"],
+                "WITHDRAWALS", with_categories=True
+            )
+            st.data_editor(
+                expenses_view,
+                column_config={
+                    "DATE": st.column_config.DateColumn("DATE", format="DD/MM/YYYY"),
+                    "WITHDRAWALS": st.column_config.NumberColumn("WITHDRAWALS", format="%.2f INR"),
+                    "CATEGORY": st.column_config.SelectboxColumn(
+                        "CATEGORY",
+                        options=list(st.session_state.categories.keys())
+                    )
+                },
+                hide_index=True,
+                use_container_width=True,
+                key=editor_key
+            )
+            
+            save_button = st.button("Apply Changes", type="primary")
+            if save_button:
+                apply_category_edits(st.session_state[editor_key], expenses_view)
+                aggregates.update_categories(st.session_state.df["CATEGORY"])
+                analytics.update_categories(st.session_state.df)
+                    
+            st.subheader('Expense Summary')
+            category_totals = aggregates.category_totals()
+            
+            st.dataframe(
+                category_totals, 
+                column_config={
+                 "WITHDRAWALS": st.column_config.NumberColumn("WITHDRAWALS", format="%.2f INR")   
+                },
+                use_container_width=True,
+                hide_index=True
+            )
+            
+            fig = aggregates.figure("expenses_pie", lambda: px.pie(
+                category_totals,
+                values="WITHDRAWALS",
+                names="CATEGORY",
+                title="Expenses by Category"
+            ))
+            st.plotly_chart(fig, use_container_width=True)
+
+            if account_totals is not None:
+                st.subheader("Expenses by Account")
                 st.dataframe(
-                    category_totals, 
+                    account_totals[["ACCOUNT", "WITHDRAWALS"]],
                     column_config={
-                     "WITHDRAWALS": st.column_config.NumberColumn("WITHDRAWALS", format="%.2f INR")   
+                     "WITHDRAWALS": st.column_config.NumberColumn("WITHDRAWALS", format="%.2f INR")
                     },
                     use_container_width=True,
                     hide_index=True
                 )
-                
-                fig = px.pie(
-                    category_totals,
-                    values="WITHDRAWALS",
-                    names="CATEGORY",
-                    title="Expenses by Category"
-                )
-                st.plotly_chart(fig, use_container_width=True)
-                
-            with tab2:
-                st.subheader("Payments Summary")
-                total_payments = df["DEPOSITS"].sum()
-                st.metric("Total Payments", f"{total_payments:,.2f} INR")
-                st.write("Deposits Details:")
-                st.dataframe(df[["DATE", "PARTICULARS", "DEPOSITS"]], 
+            
+        with tab2:
+            st.subheader("Payments Summary")
+            total_payments = aggregates.total_deposits
+            st.metric("Total Payments", f"{total_payments:,.2f} INR")
+            if account_totals is not None:
+                st.dataframe(account_totals[["ACCOUNT", "DEPOSITS"]],
                              column_config={
-                                 "DATE": st.column_config.DateColumn("DATE", format="DD/MM/YYYY"),
                                  "DEPOSITS": st.column_config.NumberColumn("DEPOSITS", format="%.2f INR")
                              },
                              use_container_width=True,
                              hide_index=True)
-            with tab3:
-                st.subheader("Balance Summary")
-                # Drop rows with NaT in DATE column before grouping
-                df_clean = df.dropna(subset=['DATE'])
-                
-                if len(df_clean) > 0:
-                    # Group by date with a daily frequency
-                    balance_summary = df_clean.groupby(pd.Grouper(key="DATE", freq="D"))["BALANCE"].last().reset_index()
-                    balance_summary.rename(columns={"BALANCE":"DAILY BALANCE"}, inplace=True)
-                    
-                    # Display the balance summary
-                    st.dataframe(balance_summary, use_container_width=True)
-                else:
-                    st.error("No valid dates found for balance summary. Please check your data.")
-                if len(df_clean) > 0:
-                    st.plotly_chart(px.line(
-                        balance_summary,
+            st.write("Deposits Details:")
+            deposits_view, _ = table_window_controls("deposits", df, ["DATE", *account_columns, "PARTICULARS", "DEPOSITS"],
+                                                "DEPOSITS")
+            st.dataframe(deposits_view, 
+                         column_config={
+                             "DATE": st.column_config.DateColumn("DATE", format="DD/MM/YYYY"),
+                             "DEPOSITS": st.column_config.NumberColumn("DEPOSITS", format="%.2f INR")
+                         },
+                         use_container_width=True,
+                         hide_index=True)
+        with tab3:
+            st.subheader("Balance Summary")
+            # Daily closing balances are precomputed when the statement is loaded
+            balance_summary = aggregates.daily_balance()
+            
+            if len(balance_summary) > 0:
+                # Display the balance summary
+                st.dataframe(balance_summary, use_container_width=True)
+                st.plotly_chart(aggregates.figure("balance_line", lambda: px.line(
+                    balance_summary,
+                    x="DATE",
+                    y="DAILY BALANCE",
+                    title="Balance Over Time")),
+                    use_container_width=True)
+                if account_totals is not None:
+                    st.plotly_chart(aggregates.figure("account_balance_line", lambda: px.line(
+                        aggregates.daily_balance(by_account=True),
                         x="DATE",
                         y="DAILY BALANCE",
-                        title="Balance Over Time"),
-                        use_container_width=True)        
-main()
+                        color="ACCOUNT",
+                        title="Balance by Account")),
+                        use_container_width=True)
+            else:
+                st.error("No valid dates found for balance summary. Please check your data.")
+        with tab4:
+            show_trends(analytics, df, account_columns)
+
+def show_performance_panel(records):
+    """Sidebar panel with the stage timings of this run and of the process so far."""
+    with st.sidebar:
+        st.header("Performance")
+        if not st.toggle("Show performance panel", key="perf_panel"):
+            return
+        st.toggle("Track memory", key="perf_memory",
+                  help="Traces Python allocations in the whole server process, which slows it down while on. "
+                       "Takes effect from the next run.")
+        import pandas as pd
+
+        st.caption("This run")
+        st.dataframe(pd.DataFrame(records).drop(columns="time"), use_container_width=True, hide_index=True)
+        st.caption(f"All sessions, last {financeapp.metrics.RECORD_LIMIT} stages")
+        st.dataframe(pd.DataFrame(financeapp.metrics.summary()), use_container_width=True, hide_index=True)
+        st.download_button("Export metrics", financeapp.metrics.to_jsonl(),
+                           file_name="financeapp-metrics.jsonl", mime="application/x-ndjson")
+
+# Tracing is process-wide, so it is only switched when this session's toggle changes.
+trace_memory = st.session_state.get("perf_memory", False)
+if trace_memory != st.session_state.get("perf_memory_traced", False):
+    financeapp.metrics.trace_memory(trace_memory)
+    st.session_state.perf_memory_traced = trace_memory
+with financeapp.metrics.collect() as run_records, financeapp.metrics.stage("run"):
+    main()
+show_performance_panel(run_records)
                 
         
\ No newline at end of file
@@ -21,18 +21,14 @@ def save_categories():
     with open(category_file,"w") as f:
         json.dump(st.session_state.categories,f)
 def categorise_transaction(df):
-    df["CATEGORY"] = "Uncategorised"
-    
+    keyword_to_category = {}
     for category, keywords in st.session_state.categories.items():
         if category == "Uncategorised" or not keywords:
             continue
-        
-        lower_keywords=[keyword for keyword in keywords]
-        
-        for idx,row in df.iterrows():
-            details=row["MODE"]
-            if details in lower_keywords:
-                df.at[idx,"CATEGORY"]= category
+        for keyword in keywords:
+            keyword_to_category[keyword] = category
+
+    df["CATEGORY"] = df["MODE"].map(keyword_to_category).fillna("Uncategorised")
     return df
 
 def load_transactions(file):
@@ -0,0 +1,104 @@
+import io
+import os
+
+import pandas as pd
+import pytest
+
+from financeapp.accounts import combine_statements, guess_accounts, merge_summaries
+from financeapp.ingest import ingest_csv_in_chunks
+
+STATEMENT = os.path.join(os.path.dirname(__file__), os.pardir, "Apr-May-Statements.csv")
+CATEGORIES = {"Uncategorised": [], "Investment": ["groww"], "Food": ["swiggy", "zomato"]}
+
+
+@pytest.fixture(scope="module")
+def raw():
+    # As text, so the split files are written back exactly as the bank exported them.
+    return pd.read_csv(STATEMENT, dtype=str, keep_default_na=False)
+
+
+def csv_file(rows):
+    return io.BytesIO(rows.to_csv(index=False).encode())
+
+
+def statement(*rows):
+    """A normalised statement from (date, particulars, deposit, withdrawal, balance) rows."""
+    df = pd.DataFrame(rows, columns=["DATE", "PARTICULARS", "DEPOSITS", "WITHDRAWALS", "BALANCE"])
+    return df.astype({"DATE": "datetime64[ns]", "DEPOSITS": "float64", "WITHDRAWALS": "float64", "BALANCE": "float64"})
+
+
+APRIL = statement(("2025-04-01", "SALARY", 1000.0, None, 1000.0),
+                  ("2025-04-02", "UPI/SWIGGY/1001", None, 100.0, 900.0),
+                  ("2025-04-03", "UPI/ZOMATO/1002", None, 50.0, 850.0))
+# Exported later: repeats 3 April with PARTICULARS split differently.
+OVERLAPPING = statement(("2025-04-03", "UPI / ZOMATO / 1002", None, 50.0, 850.0),
+                        ("2025-04-04", "UPI/GROWW/1003", None, 25.0, 825.0))
+# Opens at the balance APRIL closed with.
+CONTINUING = statement(("2025-04-05", "UPI/SWIGGY/1004", None, 30.0, 820.0))
+# Opens at 600 rather than 850: the statement in between is missing.
+AFTER_GAP = statement(("2025-04-10", "UPI/SWIGGY/1005", None, 100.0, 500.0))
+OTHER_ACCOUNT = statement(("2025-04-02", "SALARY", 5000.0, None, 250000.0))
+
+
+def test_overlapping_statements_keep_shared_rows_once():
+    frames = [OVERLAPPING, APRIL, OTHER_ACCOUNT]
+    accounts = guess_accounts(frames)
+    assert accounts == ["Account 1", "Account 1", "Account 2"]
+
+    df = combine_statements(frames, accounts)
+    assert df.attrs["duplicates"] == [1, 0, 0]
+    assert df.attrs["gaps"] == {"Account 1": [], "Account 2": []}
+    account = df[df["ACCOUNT"] == "Account 1"]
+    # The earlier statement's copy of the shared row is kept.
+    assert account["PARTICULARS"].tolist() == ["SALARY", "UPI/SWIGGY/1001", "UPI/ZOMATO/1002", "UPI/GROWW/1003"]
+    assert df["DATE"].is_monotonic_increasing
+
+
+def test_continuing_balances_are_one_account():
+    frames = [CONTINUING, APRIL, OTHER_ACCOUNT]
+    accounts = guess_accounts(frames)
+    assert accounts == ["Account 1", "Account 1", "Account 2"]
+
+    df = combine_statements(frames, accounts)
+    assert df.attrs["duplicates"] == [0, 0, 0]
+    assert df.attrs["gaps"] == {"Account 1": [], "Account 2": []}
+    assert len(df) == 5
+
+
+def test_balance_gap_between_statements_is_reported():
+    # Nothing links them, so they are only one account when the user says so.
+    assert guess_accounts([APRIL, AFTER_GAP]) == ["Account 1", "Account 2"]
+
+    df = combine_statements([AFTER_GAP, APRIL], ["Savings", "Savings"])
+    assert df.attrs["duplicates"] == [0, 0]
+    assert df.attrs["gaps"] == {"Savings": [(pd.Timestamp("2025-04-03"), pd.Timestamp("2025-04-10"))]}
+    assert len(df) == 4
+
+
+def summarise(file):
+    return ingest_csv_in_chunks(file, CATEGORIES, chunksize=16, store=False)
+
+
+def test_large_statements_count_shared_rows_once(raw):
+    half = len(raw) // 2
+    # The second half repeats the last 10 rows of the first, and is uploaded first.
+    files = [csv_file(raw.iloc[half - 10:]), csv_file(raw.iloc[:half])]
+    whole = summarise(csv_file(raw))
+
+    summaries = [summarise(file) for file in files]
+    merged = merge_summaries(files, summaries, CATEGORIES, chunksize=16)
+    assert sum(summary.rows for summary in summaries) == len(raw) + 10
+    assert merged.rows == whole.rows == len(raw)
+    assert merged.total_deposits == pytest.approx(whole.total_deposits)
+    pd.testing.assert_series_equal(merged.category_totals.sort_index(), whole.category_totals.sort_index())
+
+
+def test_large_statements_without_overlap_are_added_up(raw):
+    half = len(raw) // 2
+    files = [csv_file(raw.iloc[half:]), csv_file(raw.iloc[:half])]
+    whole = summarise(csv_file(raw))
+
+    merged = merge_summaries(files, [summarise(file) for file in files], CATEGORIES, chunksize=16)
+    assert merged.rows == whole.rows
+    assert merged.total_deposits == pytest.approx(whole.total_deposits)
+    pd.testing.assert_series_equal(merged.category_totals.sort_index(), whole.category_totals.sort_index())
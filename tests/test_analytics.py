@@ -0,0 +1,84 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from financeapp.analytics import SpendingAnalytics
+from financeapp.categorise import assign_categories
+
+CATEGORIES = ["Uncategorised", "Food", "Rent", "Travel"]
+
+
+@pytest.fixture
+def df():
+    """Eight months of categorised transactions, oldest first, as a statement would come in."""
+    rng = np.random.default_rng(0)
+    rows = 400
+    dates = pd.Timestamp("2025-01-01") + pd.to_timedelta(np.sort(rng.integers(0, 240, rows)), unit="D")
+    withdrawals = rng.lognormal(5, 1, rows).round(2)
+    withdrawals[rng.random(rows) < 0.2] = np.nan
+    return pd.DataFrame({
+        "DATE": dates,
+        "WITHDRAWALS": withdrawals,
+        "CATEGORY": pd.Categorical(rng.choice(CATEGORIES, rows), categories=CATEGORIES),
+    })
+
+
+def months(df):
+    return df["DATE"].dt.to_period("M")
+
+
+def assert_same(analytics, df):
+    """The incrementally maintained rollups equal a fresh build over df."""
+    fresh = SpendingAnalytics(df)
+    pd.testing.assert_frame_equal(analytics.monthly.sort_index(axis=1), fresh.monthly.sort_index(axis=1))
+    pd.testing.assert_frame_equal(analytics.rolling.sort_index(axis=1), fresh.rolling.sort_index(axis=1))
+    pd.testing.assert_frame_equal(analytics.weekly().sort_index(axis=1), fresh.weekly().sort_index(axis=1))
+    pd.testing.assert_frame_equal(analytics.category_statistics().sort_index(),
+                                  fresh.category_statistics().sort_index())
+    pd.testing.assert_series_equal(analytics.categories.astype(object).sort_index(),
+                                   fresh.categories.astype(object).sort_index())
+
+
+def test_adding_a_month_matches_a_full_build(df):
+    latest = months(df) == months(df).max()
+    analytics = SpendingAnalytics(df[~latest])
+    assert list(analytics.update(df[latest]).astype(str)) == ["2025-08"]
+    assert_same(analytics, df)
+
+
+def test_inserting_a_middle_month_matches_a_full_build(df):
+    # Its gap is filled with 0 first, and the rolling windows after it change too.
+    middle = months(df) == pd.Period("2025-04", freq="M")
+    analytics = SpendingAnalytics(df[~middle])
+    assert analytics.monthly.loc["2025-04"].sum() == 0
+    analytics.update(df[middle])
+    assert_same(analytics, df)
+
+
+def test_recategorising_rows_matches_a_full_build(df):
+    analytics = SpendingAnalytics(df)
+    moved = df["CATEGORY"].iloc[[3, 150, 151]].astype(object)
+    moved[:] = "Gifts"
+    edited = df.assign(CATEGORY=assign_categories(df["CATEGORY"], moved))
+
+    changed = analytics.update_categories(edited)
+    assert set(changed) == set(months(df).iloc[[3, 150, 151]])
+    assert_same(analytics, edited)
+    assert len(analytics.update_categories(edited)) == 0
+
+
+def test_refresh_with_a_shifted_index_matches_a_full_build(df):
+    # An append to the middle of the history shifts the labels of every later row.
+    appended = months(df) == pd.Period("2025-03", freq="M")
+    before = df.drop(df.index[appended][::2]).reset_index(drop=True)
+    analytics = SpendingAnalytics(before)
+
+    analytics.refresh(df, ["2025-03"])
+    assert_same(analytics, df)
+
+    # Later edits are matched to the new labels.
+    moved = df["CATEGORY"].iloc[[300]].astype(object)
+    moved[:] = "Gifts"
+    edited = df.assign(CATEGORY=assign_categories(df["CATEGORY"], moved))
+    assert list(analytics.update_categories(edited)) == [months(df).iloc[300]]
+    assert_same(analytics, edited)
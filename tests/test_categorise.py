@@ -0,0 +1,64 @@
+import pandas as pd
+
+from financeapp.aggregates import TransactionAggregates
+from financeapp.categorise import (assign_categories, categorise_transaction, compact_keywords, is_merchant_key,
+                                   learned_keyword, merchant_key)
+from financeapp.category_store import CategoryStore
+
+# Rows of Apr-May-Statements.csv whose merchant key is a truncated word or nothing.
+UNINFORMATIVE = [
+    "LIMITE/511557429988/ICI555588dc2265490986df3c",
+    "LIMITE/511530722862/ICI9ac2ad77e31d4669bb20e",
+    "I/548362661374/ICIc847657ac0364bb7a4ef51408d1",
+    "I/512141120832/ICI1305fb78598e4c4c99f5093e19f5",
+    "BA NK/548198294870/ A XBf5501e1fddb1416d85fd38",
+    "F/513006592550/ICIcf63635401f44dc5852b56acfe01",
+    "LTD/104034654555/HDF8eb3980eb1e14c769429401",
+    "/511582026139/ICI885439cd2d3b4f0b9c83f09e5d87",
+]
+GROWW = "UPI/grow w-bse.grow w/Payment request/HDFC BA NK\r\nLTD/549851384442/GPG 2025051237578599249543"
+
+
+def statement(particulars):
+    return pd.DataFrame({"PARTICULARS": particulars})
+
+
+def test_uninformative_keys_are_learned_as_exact_text():
+    for particulars in UNINFORMATIVE:
+        assert not is_merchant_key(merchant_key(particulars))
+        assert learned_keyword(particulars) == particulars
+    assert learned_keyword(GROWW) == "upi/groww/bse.groww/paymentrequest/hdfcbankltd"
+
+
+def test_editing_one_row_does_not_recategorise_unrelated_rows(tmp_path):
+    store = CategoryStore(str(tmp_path / "categories.json"))
+    assert store.add_keywords([("Shopping", UNINFORMATIVE[0]), ("Investment", GROWW)]) == 2
+
+    other_groww = GROWW.replace("549851384442", "549900000001")
+    df = categorise_transaction(statement(UNINFORMATIVE + [other_groww]), store.matcher())
+    assert df["CATEGORY"].tolist() == ["Shopping"] + ["Uncategorised"] * (len(UNINFORMATIVE) - 1) + ["Investment"]
+
+
+def test_compaction_keeps_uninformative_keywords_as_text():
+    compact = compact_keywords({"Shopping": [UNINFORMATIVE[0], "limite"], "Investment": [GROWW]})
+    assert compact == {"Shopping": [UNINFORMATIVE[0], "limite"],
+                       "Investment": ["upi/groww/bse.groww/paymentrequest/hdfcbankltd"]}
+
+
+def test_category_is_categorical_of_every_category_and_takes_new_ones():
+    categories = {"Uncategorised": [], "Investment": [GROWW], "Rent": []}
+    df = categorise_transaction(statement([GROWW, UNINFORMATIVE[0]]), categories)
+    assert list(df["CATEGORY"].cat.categories) == ["Uncategorised", "Investment", "Rent"]
+    assert df["CATEGORY"].tolist() == ["Investment", "Uncategorised"]
+
+    df["WITHDRAWALS"] = [100.0, 40.0]
+    df["DEPOSITS"] = 0.0
+    df["BALANCE"] = [900.0, 860.0]
+    df["DATE"] = pd.to_datetime(["2025-04-01", "2025-04-02"])
+    aggregates = TransactionAggregates(df)
+
+    edited = assign_categories(df["CATEGORY"], pd.Series(["Gifts"], index=[1]))
+    assert edited.tolist() == ["Investment", "Gifts"] and df["CATEGORY"].tolist() == ["Investment", "Uncategorised"]
+    assert aggregates.update_categories(edited) == 1
+    assert aggregates.category_totals().set_index("CATEGORY")["WITHDRAWALS"].to_dict() == {"Investment": 100.0,
+                                                                                           "Gifts": 40.0}
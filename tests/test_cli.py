@@ -0,0 +1,21 @@
+from financeapp.cli import process_statement
+
+STATEMENT = """DATE,PARTICULARS,DEPOSITS,WITHDRAWALS,BALANCE
+01-04-2025,UPI/SWIGGY/food,,250.00,"9,750.00"
+02-04-2025,SALARY,"1,000.00",,"10,750.00"
+"""
+CATEGORIES = {"Uncategorised": [], "Food": ["swiggy"]}
+
+
+def test_output_keeps_the_source_extension(tmp_path):
+    source = tmp_path / "statement.csv"
+    source.write_text(STATEMENT)
+
+    # Writing CSV into the input directory must not replace the input.
+    summary, _ = process_statement(str(source), str(tmp_path), CATEGORIES, output_format="csv")
+    assert summary["output"] == str(tmp_path / "statement.csv.csv")
+    assert source.read_text() == STATEMENT
+
+    summary, _ = process_statement(str(source), str(tmp_path), CATEGORIES)
+    assert summary["output"] == str(tmp_path / "statement.csv.parquet")
+    assert summary["rows"] == 2 and summary["uncategorised_rows"] == 1
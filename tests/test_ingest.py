@@ -0,0 +1,28 @@
+import pandas as pd
+import pytest
+
+from financeapp import ingest, pdf_tables, pdf_text
+
+PROTECTED = b"%PDF-1.4\ntrailer\n<< /Encrypt 5 0 R >>\n%%EOF"
+
+
+@pytest.fixture
+def cached_protected_pdf(tmp_path, monkeypatch):
+    monkeypatch.setattr(pdf_tables, "PDF_CACHE_DIR", str(tmp_path))
+    monkeypatch.setattr(pdf_tables, "check_java_installed", lambda: False)
+    pdf_tables.save_cached_tables(ingest.hash_bytes(PROTECTED), True, pd.DataFrame({"DATE": ["01-04-2025"]}))
+
+
+def test_cached_tables_of_a_protected_pdf_need_its_password(cached_protected_pdf, monkeypatch):
+    monkeypatch.setattr(pdf_text, "opens_with", lambda pdf_bytes, password=None: password == "secret")
+    assert ingest.read_pdf_statement(PROTECTED, password="secret")["DATE"].tolist() == ["01-04-2025"]
+    for password in (None, "wrong"):
+        with pytest.raises(pdf_tables.PdfPasswordError):
+            ingest.read_pdf_statement(PROTECTED, password=password)
+
+
+def test_protected_pdf_skips_the_cache_when_the_password_cannot_be_checked(cached_protected_pdf, monkeypatch):
+    monkeypatch.setattr(pdf_text, "opens_with", lambda pdf_bytes, password=None: None)
+    # Extracted again instead, which here stops at the Java check.
+    with pytest.raises(ingest.StatementError, match="Java is required"):
+        ingest.read_pdf_statement(PROTECTED, password="secret")
@@ -0,0 +1,78 @@
+import pandas as pd
+import pytest
+
+from financeapp.ingest import normalise_transactions
+from financeapp.pdf_text import COLUMNS, find_layout, iter_statement_pages, parse_page, _words
+
+CHAR_WIDTH, CHAR_HEIGHT = 5, 8
+
+
+def line(top, *cells):
+    """Character dicts for one line of text; cells are (x0, text), one character every CHAR_WIDTH points."""
+    chars = []
+    for x0, text in cells:
+        for i, char in enumerate(text):
+            left = x0 + i * CHAR_WIDTH
+            chars.append({"text": char, "x0": left, "x1": left + CHAR_WIDTH,
+                          "top": top, "bottom": top + CHAR_HEIGHT})
+    return chars
+
+
+# Generated statements often kern header words apart.
+HEADER = line(100, (10, "DATE"), (80, "PARTICULARS"), (250, "DEPOSITS"), (330, "WITHDRA WALS"), (430, "BALANCE"))
+
+
+def page(second_balance="10,750.00", first_balance="9,750.00"):
+    return (line(20, (10, "Statement of account"))
+            + HEADER
+            + line(120, (10, "01-04-2025"), (80, "UPI/SWIGGY"), (340, "250.00"), (430, first_balance))
+            + line(130, (80, "FOOD ORDER"))
+            + line(150, (10, "02-04-2025"), (80, "SALARY"), (255, "1,000.00"), (430, second_balance))
+            + line(300, (10, "Page 1 of 1")))
+
+
+def test_find_layout_splits_columns_halfway_between_header_centres():
+    header_bottom, boundaries = find_layout(page())
+    assert header_bottom == 100 + CHAR_HEIGHT
+    # Centres: DATE 20, PARTICULARS 107.5, DEPOSITS 270, WITHDRA WALS 360, BALANCE 447.5.
+    assert boundaries == [63.75, 188.75, 315.0, 403.75]
+
+
+def test_find_layout_needs_every_column():
+    assert find_layout(line(100, (10, "DATE"), (80, "PARTICULARS"), (430, "BALANCE"))) is None
+
+
+def test_parse_page_joins_continuation_lines():
+    chars = page()
+    rows = parse_page(_words(chars), find_layout(chars))
+    assert rows == [
+        {"DATE": "01-04-2025", "PARTICULARS": "UPI/SWIGGY\rFOOD ORDER",
+         "DEPOSITS": None, "WITHDRAWALS": "250.00", "BALANCE": "9,750.00"},
+        {"DATE": "02-04-2025", "PARTICULARS": "SALARY",
+         "DEPOSITS": "1,000.00", "WITHDRAWALS": None, "BALANCE": "10,750.00"},
+    ]
+
+
+def test_parse_page_rejects_broken_balance_continuity():
+    chars = page(second_balance="10,700.00")
+    assert parse_page(_words(chars), find_layout(chars)) is None
+
+    chars = page()
+    words, layout = _words(chars), find_layout(chars)
+    assert parse_page(words, layout, previous_balance=10_000.0) is not None
+    assert parse_page(words, layout, previous_balance=5_000.0) is None
+
+
+def test_parse_page_drops_the_credit_suffix_of_balances():
+    chars = page(first_balance="9,750.00 Cr", second_balance="10,750.00Cr")
+    rows = parse_page(_words(chars), find_layout(chars))
+    assert [row["BALANCE"] for row in rows] == ["9,750.00", "10,750.00"]
+
+    df = normalise_transactions(pd.DataFrame(rows, columns=COLUMNS))
+    assert df.attrs["coercion_failures"] == {}
+    assert df["BALANCE"].tolist() == [9750.0, 10750.0]
+
+
+def test_unreadable_pdf_falls_back_to_tabula():
+    pytest.importorskip("pdfminer")
+    assert iter_statement_pages(b"not a pdf") is None